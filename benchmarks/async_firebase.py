@@ -0,0 +1,108 @@
+'''
+Benchmark concurrent allowlist checks of Firebase and AsyncFirebase
+against an in-process fake Firestore.
+
+Each fake call takes a Firestore round trip. Calling the blocking client
+from the event loop, as the middleware used to, serializes concurrent
+requests, while the thread pool and AsyncFirebase overlap them. Every
+request checks a different email, so none is served from the lookup cache.
+
+    poetry run python -m benchmarks.async_firebase
+'''
+
+import asyncio
+import time
+from typing import Any
+
+from mclauncher.async_firebase import AsyncFirebase
+from mclauncher.asyncutil import call
+from mclauncher.config import Config
+from mclauncher.firebase import Firebase
+
+ROUND_TRIP = 0.02
+REQUESTS = 50
+
+
+class FakeSnapshot:
+    exists = True
+
+
+class BlockingFakeDocument:
+    def get(self):
+        time.sleep(ROUND_TRIP)
+        return FakeSnapshot()
+
+
+class AsyncFakeDocument:
+    async def get(self):
+        await asyncio.sleep(ROUND_TRIP)
+        return FakeSnapshot()
+
+
+class FakeFirestore:
+    def __init__(self, document_class: type):
+        self.__document_class = document_class
+
+    def collection(self, _):
+        return self
+
+    def document(self, _):
+        return self.__document_class()
+
+
+class BenchmarkFirebase(Firebase):
+    def _initialize_app(self) -> Any:
+        return None
+
+    def _create_firestore(self, credential: Any) -> Any:
+        return FakeFirestore(BlockingFakeDocument)
+
+
+class BenchmarkAsyncFirebase(AsyncFirebase):
+    def _initialize_app(self) -> Any:
+        return None
+
+    def _create_firestore(self, credential: Any) -> Any:
+        return FakeFirestore(AsyncFakeDocument)
+
+
+def create_config() -> Config:
+    return Config(
+        authorized_users_watch=False,
+        shutter_authorized_email='shutter@example.com',
+        instance_zone='asia-northeast1-a',
+        instance_name='minecraft',
+    )
+
+
+def emails() -> list[str]:
+    return [f'player{i}@example.com' for i in range(REQUESTS)]
+
+
+async def on_event_loop(firebase: Firebase):
+    async def request(email: str):
+        return firebase.is_authorized_user(email)
+    assert all(await asyncio.gather(*(request(email) for email in emails())))
+
+
+async def awaited(firebase: Firebase):
+    assert all(await asyncio.gather(*(
+        call(firebase.is_authorized_user, email) for email in emails()
+    )))
+
+
+def main():
+    for name, run, firebase_class in [
+        ('Firebase on event loop', on_event_loop, BenchmarkFirebase),
+        ('Firebase in thread pool', awaited, BenchmarkFirebase),
+        ('AsyncFirebase', awaited, BenchmarkAsyncFirebase),
+    ]:
+        firebase = firebase_class(create_config())
+        start = time.perf_counter()
+        asyncio.run(run(firebase))
+        elapsed = time.perf_counter() - start
+        print(f'{name:25} {REQUESTS} requests in {elapsed * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
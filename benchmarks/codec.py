@@ -0,0 +1,222 @@
+'''
+Benchmark the Minecraft protocol codec and the status path.
+
+It measures var ints across their encoded lengths, long UTF-8 strings,
+round trips through MinecraftProtocolBuffer and MinecraftStatus.read_status
+on statuses from small to favicon-heavy and many-player sizes. Each case
+reports the median of repeated runs.
+
+Results can be saved as JSON and compared with a saved baseline, failing
+with exit status 1 if a case got slower than the threshold:
+
+    poetry run python -m benchmarks.codec --output baseline.json
+    poetry run python -m benchmarks.codec --baseline baseline.json [--threshold 0.2]
+
+Baselines are only comparable on the same machine and Python.
+'''
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Optional
+
+from benchmarks.payloads import status_document, status_packet
+from mclauncher.minecraft import MinecraftProtocolBuffer, MinecraftStatus
+
+# Values encoded into 1 to 5 bytes
+VARINTS = {
+    '1 byte': 127,
+    '2 bytes': 16383,
+    '3 bytes': 2097151,
+    '4 bytes': 268435455,
+    '5 bytes': -1,
+}
+
+# Mixed 1, 2, 3 and 4 byte code points
+UTF8_TEXT = 'Minecraft ñ マインクラフト 🟩'
+
+
+def utf8_string(size: int) -> str:
+    '''Return a string of about size bytes in UTF-8.'''
+    unit = len(UTF8_TEXT.encode('utf8'))
+    return UTF8_TEXT * (size // unit + 1)
+
+
+STATUSES = {
+    'small': status_packet(status_document(players=2)),
+    '64 KB favicon': status_packet(status_document(64 * 1024, 12)),
+    '1000 players': status_packet(status_document(players=1000)),
+    '64 KB favicon, 1000 players': status_packet(status_document(64 * 1024, 1000)),
+}
+
+
+def write_varint(value: int) -> Callable[[], None]:
+    buffer = MinecraftProtocolBuffer()
+
+    def run():
+        buffer.write_varint(value)
+        buffer.flush()
+
+    return run
+
+
+def read_varint(value: int) -> Callable[[], Awaitable]:
+    buffer = MinecraftProtocolBuffer()
+    buffer.write_varint(value)
+    data = buffer.flush()
+
+    async def run():
+        await MinecraftProtocolBuffer(data).read_varint()
+
+    return run
+
+
+def write_string(text: str) -> Callable[[], None]:
+    buffer = MinecraftProtocolBuffer()
+
+    def run():
+        buffer.write_string(text)
+        buffer.flush()
+
+    return run
+
+
+def read_string(text: str) -> Callable[[], Awaitable]:
+    buffer = MinecraftProtocolBuffer()
+    buffer.write_string(text)
+    data = buffer.flush()
+
+    async def run():
+        await MinecraftProtocolBuffer(data).read_string()
+
+    return run
+
+
+def round_trip(text: str) -> Callable[[], Awaitable]:
+    '''Write a packet like a status response and read it back.'''
+    async def run():
+        buffer = MinecraftProtocolBuffer()
+        buffer.write_varint(0)
+        buffer.write_string(text)
+        result = MinecraftProtocolBuffer(buffer.flush())
+        await result.read_varint()
+        await result.read_string()
+
+    return run
+
+
+def read_status(packet: bytes) -> Callable[[], Awaitable]:
+    async def run():
+        status = MinecraftStatus(MinecraftProtocolBuffer(packet))
+        await status.read_status()
+        status.players()
+
+    return run
+
+
+def cases() -> dict[str, tuple[Callable, int]]:
+    '''Return the benchmarks with the number of calls per run.'''
+    result = {}
+    for name, value in VARINTS.items():
+        result[f'write_varint/{name}'] = (write_varint(value), 20000)
+        result[f'read_varint/{name}'] = (read_varint(value), 20000)
+    for size in (1024, 32 * 1024):
+        text = utf8_string(size)
+        result[f'write_string/{size // 1024} KB'] = (write_string(text), 2000)
+        result[f'read_string/{size // 1024} KB'] = (read_string(text), 2000)
+        result[f'round_trip/{size // 1024} KB'] = (round_trip(text), 2000)
+    for name, packet in STATUSES.items():
+        result[f'read_status/{name}'] = (read_status(packet), 200)
+    return result
+
+
+def measure(loop: asyncio.AbstractEventLoop, func: Callable, number: int) -> float:
+    '''Return seconds per call of func. Coroutines are awaited in one task.'''
+    async def run_async():
+        for _ in range(number):
+            await func()
+
+    started_at = time.perf_counter()
+    if asyncio.iscoroutinefunction(func):
+        loop.run_until_complete(run_async())
+    else:
+        for _ in range(number):
+            func()
+    return (time.perf_counter() - started_at) / number
+
+
+def run(repeat: int, only: Optional[str]) -> dict[str, float]:
+    loop = asyncio.new_event_loop()
+    try:
+        results = {}
+        for name, (func, number) in cases().items():
+            if only is not None and only not in name:
+                continue
+            measure(loop, func, max(number // 10, 1))  # warm up
+            results[name] = statistics.median(
+                measure(loop, func, number) for _ in range(repeat))
+        return results
+    finally:
+        loop.close()
+
+
+def regressions(
+    results: dict[str, float],
+    baseline: dict[str, float],
+    threshold: float,
+) -> dict[str, float]:
+    '''Return how much slower each case got than the baseline beyond threshold.'''
+    return {
+        name: seconds / baseline[name] - 1
+        for name, seconds in results.items()
+        if name in baseline and seconds > baseline[name] * (1 + threshold)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', help='run cases containing this')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--output', help='save results as JSON')
+    parser.add_argument('--baseline', help='compare with results saved with --output')
+    parser.add_argument(
+        '--threshold', type=float, default=0.2,
+        help='fail if a case is slower than the baseline by this fraction')
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.only)
+    document = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seconds_per_op': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+
+    slower = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['seconds_per_op']
+        slower = regressions(results, baseline, args.threshold)
+        document['regressions'] = slower
+
+    if args.json:
+        print(json.dumps(document))
+    else:
+        for name, seconds in results.items():
+            mark = f'  {slower[name]:+.0%} REGRESSION' if name in slower else ''
+            print(f'{name:40} {seconds * 1e6:10.2f} us/op{mark}')
+
+    if slower:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
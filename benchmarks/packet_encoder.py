@@ -0,0 +1,88 @@
+'''
+Benchmark encoding the handshake and the status request.
+
+It compares building packets with MinecraftPacket with the previous
+byte-by-byte writes and counts writes issued to the connection per probe.
+
+    poetry run python -m benchmarks.packet_encoder
+'''
+
+from ctypes import c_uint32 as uint32
+import struct
+import timeit
+
+from mclauncher.minecraft import MinecraftPacket, MinecraftProtocolBuffer
+
+HOST = 'minecraft.example.com'
+PORT = 25565
+VERSION = 757
+
+
+class CountingBuffer(MinecraftProtocolBuffer):
+    '''Buffer counting writes like a connection would issue them.'''
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, data: bytes):
+        self.writes += 1
+        super().write(data)
+
+
+def legacy_write_varint(buffer: MinecraftProtocolBuffer, data: int):
+    '''The previous write_varint writing each byte separately.'''
+    data = uint32(data).value
+    for _ in range(5):
+        if data & ~0x7f == 0:
+            buffer.write(struct.pack('>B', data))
+            return
+
+        buffer.write(struct.pack('>B', data & 0x7F | 0x80))
+        data >>= 7
+
+
+def legacy_probe(connection: MinecraftProtocolBuffer):
+    '''Handshake and status request as they were written before.'''
+    buffer = MinecraftProtocolBuffer()
+    legacy_write_varint(buffer, 0)
+    legacy_write_varint(buffer, VERSION)
+    legacy_write_varint(buffer, len(HOST))
+    buffer.write(HOST.encode('utf8'))
+    buffer.write(struct.pack('>H', PORT))
+    legacy_write_varint(buffer, 1)
+    data = buffer.flush()
+    legacy_write_varint(connection, len(data))
+    connection.write(data)
+
+    buffer = MinecraftProtocolBuffer()
+    legacy_write_varint(buffer, 0)
+    data = buffer.flush()
+    legacy_write_varint(connection, len(data))
+    connection.write(data)
+
+
+def packet_probe(connection: MinecraftProtocolBuffer):
+    '''Handshake and status request built with MinecraftPacket.'''
+    connection.write_packet(
+        MinecraftPacket(0).varint(VERSION).string(HOST).ushort(PORT).varint(1)
+    )
+    connection.write_packet(MinecraftPacket(0))
+
+
+def main():
+    for probe in [legacy_probe, packet_probe]:
+        connection = CountingBuffer()
+        probe(connection)
+        payload = connection.flush()
+
+        number = 100000
+        elapsed = timeit.timeit(lambda: probe(CountingBuffer()), number=number)
+        print(
+            f'{probe.__name__:15} {connection.writes:3} writes/probe '
+            f'{len(payload):4} bytes {elapsed / number * 1e6:8.2f} us/probe'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+'''
+Status payloads shared by the benchmarks.
+'''
+
+import base64
+import json
+import os
+from typing import Optional
+
+from mclauncher.minecraft import MinecraftPacket, MinecraftProtocolBuffer
+
+
+def status_document(
+    favicon_size: int = 0,
+    players: int = 0,
+    sample_size: Optional[int] = None,
+) -> str:
+    '''
+    Build a status response with a favicon of about favicon_size bytes.
+
+    The sample lists sample_size of the players, or all of them by default.
+    '''
+    if sample_size is None:
+        sample_size = players
+
+    status = {
+        'version': {'name': '1.18.1', 'protocol': 757},
+        'players': {
+            'max': max(players, 20),
+            'online': players,
+            'sample': [
+                {'name': f'Player{i}', 'id': f'00000000-0000-0000-0000-{i:012}'}
+                for i in range(min(players, sample_size))
+            ],
+        },
+        'description': {'text': 'A Minecraft Server'},
+    }
+    if favicon_size > 0:
+        favicon = base64.b64encode(os.urandom(favicon_size * 3 // 4))
+        status['favicon'] = f'data:image/png;base64,{favicon.decode("ascii")}'
+    return json.dumps(status)
+
+
+def status_response(document: str) -> bytes:
+    '''Build the status response packet without its length prefix.'''
+    buffer = MinecraftProtocolBuffer()
+    buffer.write_varint(0)
+    buffer.write_string(document)
+    return buffer.flush()
+
+
+def status_packet(document: str) -> bytes:
+    '''Build the status response packet with its length prefix as a server sends it.'''
+    return MinecraftPacket(0).string(document).build()
@@ -0,0 +1,72 @@
+'''
+Benchmark MinecraftProtocolBuffer on 64 KB status payloads.
+
+It compares the cursor-based buffer with the previous implementation,
+which copied the rest of the buffer on every read.
+
+    poetry run python -m benchmarks.protocol_buffer
+'''
+
+import asyncio
+import time
+
+from benchmarks.payloads import status_document, status_response
+from mclauncher.minecraft import MinecraftProtocol, MinecraftProtocolBuffer
+
+
+class CopyingProtocolBuffer(MinecraftProtocol):
+    '''The previous MinecraftProtocolBuffer.'''
+
+    def __init__(self, data: bytes = b''):
+        self.__read_buffer = bytearray(data)
+
+    async def connect(self):
+        pass
+
+    async def read(self, length: int) -> bytes:
+        data = bytes(self.__read_buffer[:length])
+        self.__read_buffer = self.__read_buffer[length:]
+        return data
+
+    def write(self, data: bytes):
+        raise NotImplementedError()
+
+
+async def parse_packet(buffer_class: type, packet: bytes, iterations: int):
+    for _ in range(iterations):
+        buffer = buffer_class(packet)
+        await buffer.read_varint()
+        await buffer.read_string()
+
+
+async def read_bytewise(buffer_class: type, packet: bytes, iterations: int):
+    for _ in range(iterations):
+        buffer = buffer_class(packet)
+        for _ in range(len(packet)):
+            await buffer.read_byte()
+
+
+def measure(func, *args) -> float:
+    start = time.perf_counter()
+    asyncio.run(func(*args))
+    return time.perf_counter() - start
+
+
+def main():
+    packet = status_response(status_document(64 * 1024))
+    print(f'payload: {len(packet)} bytes')
+
+    for name, func, iterations in [
+        ('parse packet', parse_packet, 200),
+        ('read byte by byte', read_bytewise, 1),
+    ]:
+        for buffer_class in [CopyingProtocolBuffer, MinecraftProtocolBuffer]:
+            elapsed = measure(func, buffer_class, packet, iterations)
+            print(
+                f'{name:20} {buffer_class.__name__:25} '
+                f'{elapsed / iterations * 1000:10.3f} ms/op'
+            )
+
+
+if __name__ == '__main__':
+    main()
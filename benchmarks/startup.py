@@ -0,0 +1,84 @@
+'''
+Benchmark the cold start of the app with python -X importtime.
+
+Each run imports main in a fresh interpreter, which is what a Cloud Run
+instance pays before it serves the first request. Clients are created on
+first use, so no credentials are needed.
+
+    poetry run python -m benchmarks.startup [--runs 5] [--json]
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ENV = {
+    'INSTANCE_ZONE': 'asia-northeast1-a',
+    'INSTANCE_NAME': 'minecraft',
+    'SHUTTER_AUTHORIZED_EMAIL': 'shutter@example.com',
+}
+TOP = 10
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    '''Return microseconds spent importing each top level package.'''
+    result = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        result[package] = result.get(package, 0) + int(self_time)
+    return result
+
+
+def run_once() -> tuple[float, dict[str, int]]:
+    started_at = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        env={**os.environ, **ENV},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - started_at, parse_importtime(completed.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    # The first run warms up the bytecode cache.
+    run_once()
+    runs = [run_once() for _ in range(args.runs)]
+
+    wall = statistics.median(elapsed for elapsed, _ in runs)
+    modules = {
+        name: statistics.median(imports.get(name, 0) for _, imports in runs)
+        for name in set().union(*(imports for _, imports in runs))
+    }
+    imports = sum(modules.values())
+    top = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:TOP]
+
+    if args.json:
+        print(json.dumps({
+            'wall_seconds': wall,
+            'import_seconds': imports / 1e6,
+            'top_packages': {name: micros / 1e6 for name, micros in top},
+        }))
+        return
+
+    print(f'{"process start to app created":40} {wall * 1000:8.1f} ms')
+    print(f'{"imports":40} {imports / 1000:8.1f} ms')
+    for name, micros in top:
+        print(f'  {name:38} {micros / 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
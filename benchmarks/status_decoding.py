@@ -0,0 +1,39 @@
+'''
+Benchmark decoding status responses.
+
+It compares json.loads of the whole status with decode_json_object, which
+skips the favicon as MinecraftStatus does.
+
+    poetry run python -m benchmarks.status_decoding
+'''
+
+import json
+import timeit
+
+from benchmarks.payloads import status_document
+from mclauncher.minecraft import decode_json_object
+
+
+PAYLOADS = {
+    'no favicon': status_document(players=2),
+    '8 KB favicon': status_document(8 * 1024, 2),
+    '64 KB favicon': status_document(64 * 1024, 12),
+}
+
+
+def main():
+    for name, document in PAYLOADS.items():
+        for label, decode in [
+            ('json.loads', json.loads),
+            ('decode_json_object', lambda d: decode_json_object(d, {'favicon'})),
+        ]:
+            number = 2000
+            elapsed = timeit.timeit(lambda: decode(document), number=number)
+            print(
+                f'{name:15} {len(document):7} bytes {label:20} '
+                f'{elapsed / number * 1e6:9.2f} us/op'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,9 @@ RESTful API and index.html for mclauncher.
 """
 
 from mclauncher.app import create_app
+from mclauncher.compute_engine import ComputeEngine
 from mclauncher.config import Config
+from mclauncher.firebase import Firebase
 from mclauncher.minecraft import MinecraftConnection, MinecraftProtocol
 
 
@@ -11,7 +13,21 @@ def connect_minecraft(address: str) -> MinecraftProtocol:
     return MinecraftConnection(address)
 
 
+config = Config()
+
+firebase_class: type[Firebase] = Firebase
+if config.async_firebase:
+    from mclauncher.async_firebase import AsyncFirebase
+    firebase_class = AsyncFirebase
+
+compute_engine_class: type[ComputeEngine] = ComputeEngine
+if config.async_compute_engine:
+    from mclauncher.async_compute_engine import AsyncComputeEngine
+    compute_engine_class = AsyncComputeEngine
+
 app = create_app(
-    config=Config(),
+    config=config,
     connect_minecraft=connect_minecraft,
+    firebase_class=firebase_class,
+    compute_engine_class=compute_engine_class,
 )
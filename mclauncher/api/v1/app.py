@@ -2,11 +2,18 @@
 
 from logging import getLogger
 
-from typing import Callable
+from typing import Optional, Union
 from fastapi import FastAPI, status, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
+from mclauncher.asyncutil import call
 from mclauncher.compute_engine import ComputeEngine
-from mclauncher.minecraft import MinecraftProtocol, MinecraftStatus
+from mclauncher.fleet import Fleet, FleetServer
+from mclauncher.latency import LatencyHistogram
+from mclauncher.operations import OperationTracker
+from mclauncher.profiling import RequestProfiler
+from mclauncher.readiness import PHASE_READY, PHASE_STARTING, ReadinessTracker
+from mclauncher.server_status import ServerStatus, ServerStatusCache, ServerStatusPoller
 
 from . import schema
 
@@ -15,14 +22,73 @@ logger = getLogger('uvicorn')
 
 
 def create_app(
-    connect_minecraft: Callable[[str], MinecraftProtocol],
     compute_engine: ComputeEngine,
+    operations: OperationTracker,
+    status_cache: ServerStatusCache,
+    status_poller: ServerStatusPoller,
+    fleet: Fleet,
+    readiness: ReadinessTracker,
+    profiler: Optional[RequestProfiler] = None,
 ) -> FastAPI:
     app = FastAPI(root_path="/api/v1")
 
-    def _get_instance():
+    def _server_response(server_status: ServerStatus) -> schema.GetServerResponse:
+        phase = readiness.phase
+        if server_status.running and phase is not None:
+            phase = PHASE_READY
+        elif phase != PHASE_STARTING:
+            phase = None
+
+        return schema.GetServerResponse(
+            running=server_status.running,
+            players=server_status.players,
+            age=server_status.age,
+            phase=phase,
+            time_to_ready=readiness.time_to_ready if phase == PHASE_READY else None,
+        )
+
+    def _fleet_server_response(
+        server: FleetServer,
+        result: Union[ServerStatus, Exception],
+    ) -> schema.GetServersServerResponse:
+        if isinstance(result, Exception):
+            return schema.GetServersServerResponse(
+                name=server.name, running=False, players=[], error=str(result))
+
+        return schema.GetServersServerResponse(
+            name=server.name,
+            running=result.running,
+            players=result.players,
+            age=result.age,
+        )
+
+    def _latency_response(histogram: LatencyHistogram) -> schema.GetLatencyResponse:
+        snapshot = histogram.snapshot()
+        return schema.GetLatencyResponse(
+            count=snapshot.count,
+            buckets=[
+                schema.LatencyBucket(
+                    le='+Inf' if bound == float('inf') else str(bound), count=count)
+                for bound, count in snapshot.buckets
+            ],
+            p50=snapshot.p50,
+            p90=snapshot.p90,
+            p99=snapshot.p99,
+            last=snapshot.last,
+        )
+
+    def _get_fleet_server(name: str) -> FleetServer:
+        server = fleet.get(name)
+        if server is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="server not found",
+            )
+        return server
+
+    async def _get_instance():
         try:
-            return compute_engine.get_instance()
+            return await call(compute_engine.get_instance)
         except Exception as error:
             logger.error('get_instance(): %r', error)
             raise HTTPException(
@@ -30,50 +96,122 @@ def create_app(
                 detail=str(error)
             ) from error
 
-    @app.get("/server", response_model=schema.GetServerResponse)
+    @app.get(
+        "/server",
+        response_model=schema.GetServerResponse,
+        response_model_exclude_none=True,
+    )
     async def get_server():
         """
         Returns the server status.
-        """
-
-        response = schema.GetServerResponse(running=False, players=[])
 
-        instance = _get_instance()
+        While the server is starting, the readiness tracker is probing it,
+        so the status is returned without probing it again.
+        """
 
-        if not instance.is_running:
-            return response
+        if readiness.phase == PHASE_STARTING:
+            return _server_response(ServerStatus(
+                running=False, players=[], probed_at=readiness.probed_at))
 
         try:
-            connection = connect_minecraft(instance.address)
-            mc_status = MinecraftStatus(connection)
-            await mc_status.read_status()
-            response.running = True
-            response.players = mc_status.players()
-        except ConnectionRefusedError:
-            return response
+            server_status = await status_cache.get()
         except Exception as error:
-            logger.error('getting minecraft status: %r', error)
+            logger.error('getting server status: %r', error)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=str(error)
             ) from error
 
-        return response
+        return _server_response(server_status)
+
+    @app.get(
+        "/server/stream",
+        response_class=StreamingResponse,
+        responses={200: {"content": {"text/event-stream": {}}}},
+    )
+    async def stream_server():
+        """
+        Streams the server status as Server-Sent Events.
+
+        Each event is a GetServerResponse sent when the status changes.
+        """
+
+        async def events():
+            async for server_status in status_poller.subscribe():
+                yield f'data: {_server_response(server_status).json(exclude_none=True)}\n\n'
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+
+    @app.get("/servers", response_model=schema.GetServersResponse)
+    async def get_servers():
+        """
+        Returns the status of all the servers in the fleet.
+        """
+
+        return schema.GetServersResponse(servers=[
+            _fleet_server_response(server, result)
+            for server, result in await fleet.statuses()
+        ])
 
-    @app.post("/server/start", response_model=schema.StartServerResponse)
-    def start_server():
+    @app.get("/servers/{name}", response_model=schema.GetServersServerResponse)
+    async def get_fleet_server(name: str):
         """
-        Start the server.
+        Returns the status of a server in the fleet.
         """
 
-        instance = _get_instance()
+        server = _get_fleet_server(name)
+
+        try:
+            result = await server.status_cache.get()
+        except Exception as error:
+            logger.error('getting status of %s: %r', name, error)
+            result = error
+
+        return _fleet_server_response(server, result)
+
+    @app.get("/server/latency", response_model=schema.GetLatencyResponse)
+    async def get_server_latency():
+        """
+        Returns the histogram of recent ping latencies of the server.
+        """
+
+        return _latency_response(status_cache.latency)
+
+    @app.get("/servers/{name}/latency", response_model=schema.GetLatencyResponse)
+    async def get_fleet_server_latency(name: str):
+        """
+        Returns the histogram of recent ping latencies of a server in the fleet.
+        """
+
+        return _latency_response(_get_fleet_server(name).status_cache.latency)
+
+    @app.post(
+        "/server/start",
+        response_model=schema.StartServerResponse,
+        response_model_exclude_none=True,
+    )
+    async def start_server():
+        """
+        Start the server without waiting for it to boot.
+        """
+
+        instance = await _get_instance()
 
         if instance.is_running:
             return schema.StartServerResponse(ok=False)
 
+        if instance.is_suspending:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="server is being suspended",
+            )
+
         try:
-            compute_engine.start_instance()
-            return schema.StartServerResponse(ok=True)
+            operation = await operations.start_instance()
         except Exception as error:
             logger.error('start_instance(): %r', error)
             raise HTTPException(
@@ -81,4 +219,67 @@ def create_app(
                 detail=str(error),
             ) from error
 
+        if operation.error is not None:
+            logger.error('start_instance(): %s', operation.error)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=operation.error,
+            )
+
+        status_cache.invalidate()
+        readiness.begin()
+        return schema.StartServerResponse(ok=True, operation_id=operation.id)
+
+    @app.get("/operations/{operation_id}", response_model=schema.GetOperationResponse)
+    async def get_operation(operation_id: str):
+        """
+        Returns the progress of an operation.
+        """
+
+        operation = await operations.get(operation_id)
+
+        if operation is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="operation not found",
+            )
+
+        return schema.GetOperationResponse(
+            id=operation.id,
+            kind=operation.kind,
+            status=operation.status,
+            progress=operation.progress,
+            error=operation.error,
+        )
+
+    if profiler is not None:
+        @app.get("/profiles", response_model=schema.GetProfilesResponse)
+        async def get_profiles():
+            """
+            Returns the profiled requests from the newest.
+            """
+            return schema.GetProfilesResponse(profiles=[
+                schema.ProfileSummary(
+                    id=profile.id,
+                    method=profile.method,
+                    path=profile.path,
+                    started_at=profile.started_at,
+                    duration=profile.duration,
+                )
+                for profile in reversed(profiler.profiles)
+            ])
+
+        @app.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+        async def get_profile(profile_id: str):
+            """
+            Returns the functions taking the most time in a profiled request.
+            """
+            profile = profiler.get(profile_id)
+            if profile is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="profile not found",
+                )
+            return PlainTextResponse(profile.stats())
+
     return app
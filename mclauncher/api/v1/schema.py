@@ -1,5 +1,7 @@
 """API schemas"""
 
+from typing import Optional
+
 from pydantic import BaseModel
 from pydantic.fields import Field
 
@@ -11,8 +13,80 @@ class GetServerResponse(BaseModel):
         description="A list of players joining the server.",
         example=["Steve", "Alex"]
     )
+    age: float = Field(
+        description="Seconds since the status was probed.", example=0.5)
+    phase: Optional[str] = Field(
+        description="starting while the server boots after a start, and ready once it answers.",
+        example="ready",
+    )
+    time_to_ready: Optional[float] = Field(
+        description="Seconds from the start to the server answering, in the ready phase.",
+        example=42.0,
+    )
+
+
+class GetServersServerResponse(BaseModel):
+    """Status of a server in the fleet."""
+    name: str = Field(description="Name of the server.", example="survival")
+    running: bool = Field(description="Wether the server is running or not.")
+    players: list[str] = Field(
+        description="A list of players joining the server.",
+        example=["Steve", "Alex"]
+    )
+    age: Optional[float] = Field(
+        description="Seconds since the status was probed.", example=0.5)
+    error: Optional[str] = Field(
+        description="Error if the status couldn't be probed.")
+
+
+class GetServersResponse(BaseModel):
+    """Response for /api/v1/servers."""
+    servers: list[GetServersServerResponse]
+
+
+class LatencyBucket(BaseModel):
+    """Cumulative count of latencies up to a bound."""
+    le: str = Field(description="Upper bound in seconds, or +Inf.", example="0.05")
+    count: int
+
+
+class GetLatencyResponse(BaseModel):
+    """Response for /api/v1/server/latency and /api/v1/servers/{name}/latency."""
+    count: int = Field(description="Number of recent pings in the histogram.")
+    buckets: list[LatencyBucket]
+    p50: Optional[float] = Field(description="Median round-trip time in seconds.")
+    p90: Optional[float]
+    p99: Optional[float]
+    last: Optional[float] = Field(description="Round-trip time of the last ping in seconds.")
+
+
+class ProfileSummary(BaseModel):
+    """Profiled request."""
+    id: str
+    method: str = Field(example="GET")
+    path: str = Field(example="/api/v1/server")
+    started_at: float = Field(description="Unix time when the request started.")
+    duration: float = Field(description="Seconds taken by the request.")
+
+
+class GetProfilesResponse(BaseModel):
+    """Response for /api/v1/profiles."""
+    profiles: list[ProfileSummary]
 
 
 class StartServerResponse(BaseModel):
     """Response for /api/v1/server/start."""
     ok: bool
+    operation_id: Optional[str] = Field(
+        description="ID of the operation starting the server. See /api/v1/operations/{id}."
+    )
+
+
+class GetOperationResponse(BaseModel):
+    """Response for /api/v1/operations/{id}."""
+    id: str
+    kind: str = Field(description="Kind of the operation.", example="start")
+    status: str = Field(
+        description="One of PENDING, RUNNING or DONE.", example="RUNNING")
+    progress: int = Field(description="Progress in percent.", example=50)
+    error: Optional[str] = Field(description="Error if the operation failed.")
@@ -1,19 +1,30 @@
 '''Create app'''
 
+from contextlib import asynccontextmanager
+import hmac
 from logging import getLogger
 from os import path
-from typing import Callable, Optional
+from typing import Any, Awaitable, Callable, Optional, Union
 
 from fastapi import FastAPI, Request, status, Header
 from fastapi.exceptions import HTTPException
-from firebase_admin.auth import InvalidIdTokenError, CertificateFetchError, ExpiredIdTokenError, RevokedIdTokenError, UserDisabledError
 from starlette.templating import Jinja2Templates
-from starlette.responses import HTMLResponse, JSONResponse
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse
 
+from mclauncher.asyncutil import call
+from mclauncher.circuit_breaker import MinecraftProbeGuard
 from mclauncher.compute_engine import ComputeEngine
 from mclauncher.config import Config
 from mclauncher.firebase import Firebase
+from mclauncher.fleet import Fleet
+from mclauncher.id_token_cache import IdTokenCache
+from mclauncher.metrics import Metrics
 from mclauncher.minecraft import MinecraftProtocol
+from mclauncher.minecraft_query import MinecraftQueryClient
+from mclauncher.operations import OperationTracker
+from mclauncher.profiling import RequestProfiler
+from mclauncher.readiness import ReadinessTracker
+from mclauncher.server_status import ServerStatusCache, ServerStatusPoller, probe_server
 from mclauncher.shutter import Shutter
 
 from .api.v1 import create_app as create_v1
@@ -22,46 +33,63 @@ _AUTH_SCHEME = "Bearer"
 logger = getLogger('uvicorn')
 
 
-def _authorize(app, verify_id_token: Callable, is_authorized_user: Callable[[str], bool]):
+def _token_error_response(error: Exception) -> Optional[JSONResponse]:
+    """Return the response to an error of verifying an ID token."""
+    # firebase_admin is imported here to keep it off the cold start.
+    from firebase_admin.auth import InvalidIdTokenError, CertificateFetchError, ExpiredIdTokenError, RevokedIdTokenError, UserDisabledError
+
+    if isinstance(error, KeyError):
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={'detail': f'invalid header: {error}'}
+        )
+    if isinstance(error, (ExpiredIdTokenError, RevokedIdTokenError)):
+        return JSONResponse(
+            status_code=status.HTTP_403_FORBIDDEN,
+            content={'detail': f'invalid token: {error}'},
+        )
+    if isinstance(error, (ValueError, InvalidIdTokenError)):
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={'detail': f'invalid token: {error}'}
+        )
+    if isinstance(error, UserDisabledError):
+        return JSONResponse(
+            status_code=status.HTTP_403_FORBIDDEN,
+            content={'detail': f'invalid user: {error}'},
+        )
+    if isinstance(error, CertificateFetchError):
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={'detail': f'internal server error: {error}'},
+        )
+    return None
+
+
+def _authorize(
+    app,
+    verify_id_token: Callable[[str], Awaitable[Any]],
+    is_authorized_user: Callable[[str], Union[bool, Awaitable[bool]]],
+):
     """Create a middleware to authorize requests."""
     @app.middleware("http")
     async def _authorize(request: Request, call_next):
         try:
             id_token = request.headers["Authorization"][len(_AUTH_SCHEME)+1:]
-            token = verify_id_token(id_token)
-        except (KeyError,) as error:
-            return JSONResponse(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                content={'detail': f'invalid header: {error}'}
-            )
-        except (ExpiredIdTokenError, RevokedIdTokenError) as error:
-            return JSONResponse(
-                status_code=status.HTTP_403_FORBIDDEN,
-                content={'detail': f'invalid token: {error}'},
-            )
-        except (ValueError, InvalidIdTokenError) as error:
-            return JSONResponse(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                content={'detail': f'invalid token: {error}'}
-            )
-        except (UserDisabledError,) as error:
+            token = await verify_id_token(id_token)
+        except Exception as error:
+            response = _token_error_response(error)
+            if response is None:
+                raise
+            return response
+
+        if await call(is_authorized_user, token['email']):
+            return await call_next(request)
+        else:
             return JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
-                content={'detail': f'invalid user: {error}'},
-            )
-        except (CertificateFetchError,) as error:
-            return JSONResponse(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                content={'detail': f'internal server error: {error}'},
+                content={'detail': 'forbidden'},
             )
-        else:
-            if is_authorized_user(token['email']):
-                return await call_next(request)
-            else:
-                return JSONResponse(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    content={'detail': 'forbidden'},
-                )
 
 
 def create_app(
@@ -71,27 +99,126 @@ def create_app(
     compute_engine_class: type[ComputeEngine] = ComputeEngine,
     shutter_class: type[Shutter] = Shutter,
 ):
-    app = FastAPI()
+    @asynccontextmanager
+    async def lifespan(_: FastAPI):
+        status_poller.start()
+        yield
+        await readiness.stop()
+        await status_poller.stop()
+        await fleet.close()
+
+    app = FastAPI(lifespan=lifespan)
     templates = Jinja2Templates(
         directory=path.join(path.dirname(__file__), 'templates'),
     )
+    metrics = Metrics()
+    firebase_class = metrics.instrument_class(firebase_class, 'firebase')
+    compute_engine_class = metrics.instrument_class(compute_engine_class, 'compute_engine')
+    connect_minecraft_unguarded = metrics.instrument_connection(connect_minecraft)
+    probe_guard = MinecraftProbeGuard(config)
+    connect_minecraft = probe_guard.guard(connect_minecraft_unguarded)
+    query = None
+    if config.minecraft_query:
+        query = MinecraftQueryClient(port=config.minecraft_query_port).query
     firebase = firebase_class(config)
     compute_engine = compute_engine_class(config)
+    operations = OperationTracker(compute_engine, config)
     shutter = shutter_class(
         config=config,
         connect_minecraft=connect_minecraft,
         firebase=firebase,
         compute_engine=compute_engine,
+        operations=operations,
+        query=query,
     )
 
-    v1 = create_v1(
+    id_token_cache = IdTokenCache(
+        verify_id_token=firebase.verify_id_token,
+        max_size=config.id_token_cache_size,
+        ttl=config.id_token_cache_ttl,
+    )
+
+    status_cache = ServerStatusCache(
+        probe=lambda: probe_server(
+            lambda: call(compute_engine.get_instance), connect_minecraft,
+            ping=config.minecraft_ping,
+            query=query,
+        ),
+        ttl=config.server_status_ttl,
+    )
+    status_poller = ServerStatusPoller(
+        status_cache=status_cache,
+        interval=config.server_status_poll_interval,
+    )
+
+    async def probe_ready() -> bool:
+        # Connections are refused while the world is loading, so the probes
+        # bypass the circuit breaker instead of opening it, and close it
+        # once the server answers.
+        instance = await call(compute_engine.get_instance)
+
+        async def get_instance():
+            return instance
+
+        server_status = await probe_server(get_instance, connect_minecraft_unguarded)
+        if server_status.running:
+            probe_guard.reset(instance.address)
+        return server_status.running
+
+    readiness = ReadinessTracker(
+        probe=probe_ready,
+        config=config,
+        on_ready=status_cache.invalidate,
+    )
+
+    fleet = Fleet.from_config(
+        config=config,
+        compute_engine_class=compute_engine_class,
         connect_minecraft=connect_minecraft,
         compute_engine=compute_engine,
+        status_cache=status_cache,
+        query=query,
+    )
+
+    metrics.register(
+        'mclauncher_firestore_operations_total', 'counter',
+        'Firestore operations issued by the Firebase client.',
+        lambda: [
+            ({'operation': 'read'}, firebase.firestore_reads),
+            ({'operation': 'write'}, firebase.firestore_writes),
+        ],
+    )
+    metrics.register_cache('id_token', id_token_cache)
+    for server in fleet.servers:
+        metrics.register_cache('server_status', server.status_cache, server=server.name)
+
+    profiler = None
+    if config.profiling:
+        async def is_authorized_request(request: Request) -> bool:
+            try:
+                id_token = request.headers["Authorization"][len(_AUTH_SCHEME)+1:]
+                token = await id_token_cache.verify_id_token(id_token)
+                return await call(firebase.is_authorized_user, token['email'])
+            except Exception:
+                return False
+
+        profiler = RequestProfiler(config, is_authorized=is_authorized_request)
+        # The middleware isn't added at all unless profiling is enabled.
+        app.middleware("http")(profiler.dispatch)
+
+    v1 = create_v1(
+        compute_engine=compute_engine,
+        operations=operations,
+        status_cache=status_cache,
+        status_poller=status_poller,
+        fleet=fleet,
+        readiness=readiness,
+        profiler=profiler,
     )
 
     _authorize(
         app=v1,
-        verify_id_token=firebase.verify_id_token,
+        verify_id_token=id_token_cache.verify_id_token,
         is_authorized_user=firebase.is_authorized_user
     )
     app.mount("/api/v1", v1)
@@ -110,6 +237,28 @@ def create_app(
             }
         )
 
+    if config.metrics_token is not None:
+        @app.get("/metrics", response_class=PlainTextResponse)
+        async def _metrics(authorization: Optional[str] = Header(None)):
+            """
+            Metrics of the external dependencies in the Prometheus text format.
+            """
+            if authorization is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="not authorized",
+                )
+
+            expected = f'{_AUTH_SCHEME} {config.metrics_token}'
+            if not hmac.compare_digest(authorization.encode('utf8'), expected.encode('utf8')):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="forbidden",
+                )
+
+            return PlainTextResponse(
+                metrics.render(), media_type='text/plain; version=0.0.4')
+
     @app.post("/shutter", status_code=status.HTTP_200_OK)
     async def _shutter(authorization: Optional[str] = Header(None)):
         if authorization is None:
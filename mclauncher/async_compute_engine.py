@@ -0,0 +1,137 @@
+'''Asyncio-native Compute Engine client'''
+
+import asyncio
+from typing import TYPE_CHECKING, Any, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from mclauncher.compute_engine import (
+    AGGREGATED_INSTANCES_FIELDS, INSTANCE_FIELDS, ComputeEngine, _stop_action, _to_instance,
+    _to_instances,
+)
+from mclauncher.config import Config
+
+from .instance import Instance
+
+if TYPE_CHECKING:
+    import httpx
+
+
+class AsyncComputeEngine(ComputeEngine):
+    '''Compute Engine client with coroutine methods calling the REST API.'''
+
+    __BASE_URL = 'https://compute.googleapis.com/compute/v1'
+    __SCOPES = ['https://www.googleapis.com/auth/compute']
+
+    def __init__(self, config: Config, timeout: float = 30):
+        self.instance_zone = config.instance_zone
+        self.instance_name = config.instance_name
+        self.lifecycle = config.instance_lifecycle
+
+        self.__credentials: Any = None
+        self.__project: Optional[str] = None
+        self.__timeout = timeout
+        self.__client: Optional['httpx.AsyncClient'] = None
+        self.__refresh_lock = asyncio.Lock()
+
+    @property
+    def project(self) -> Optional[str]:
+        '''The project of the default credentials, known after the first request.'''
+        return self.__project
+
+    async def get_instance(self) -> Instance:
+        return _to_instance(await self.__request(
+            'GET', self.__instance_path(), params={'fields': INSTANCE_FIELDS}))
+
+    async def list_instances(self, label: str) -> dict[tuple[str, str], Instance]:
+        path = 'aggregated/instances'
+        params = {
+            'filter': f'labels.{label}:*',
+            'fields': AGGREGATED_INSTANCES_FIELDS,
+        }
+
+        result = {}
+        while True:
+            response = await self.__request('GET', path, params=params)
+            result.update(_to_instances(response))
+            if 'nextPageToken' not in response:
+                return result
+            params['pageToken'] = response['nextPageToken']
+
+    async def start_instance(self) -> bool:
+        await self._wait_operation(await self.request_start_instance())
+        return True
+
+    async def stop_instance(self) -> bool:
+        await self._wait_operation(await self.request_stop_instance())
+        return True
+
+    async def request_start_instance(self) -> dict:
+        action = 'resume' if (await self.get_instance()).is_suspended else 'start'
+        return await self.__request('POST', self.__instance_path(action))
+
+    async def request_stop_instance(self) -> dict:
+        return await self.__request('POST', self.__instance_path(_stop_action(self.lifecycle)))
+
+    async def get_operation(self, name: str) -> dict:
+        return await self.__request('GET', self.__operation_path(name))
+
+    async def close(self):
+        if self.__client is not None:
+            await self.__client.aclose()
+            self.__client = None
+
+    async def _wait_operation(self, result: dict) -> dict:
+        while True:
+            if result['status'] == 'DONE':
+                if 'error' in result:
+                    raise Exception(result['error'])
+                return result
+
+            await asyncio.sleep(0.5)
+            result = await self.get_operation(result['name'])
+
+    async def __request(self, method: str, path: str, **kwargs) -> dict:
+        '''Request the path relative to the project.'''
+        headers = {'Authorization': f'Bearer {await self.__token()}'}
+        url = f'{self.__BASE_URL}/projects/{self.__project}/{path}'
+        response = await self.__get_client().request(
+            method, url, headers=headers, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def __token(self) -> str:
+        credentials = self.__credentials
+        if credentials is None or not credentials.valid:
+            async with self.__refresh_lock:
+                await run_in_threadpool(self.__refresh_credentials)
+        return self.__credentials.token
+
+    def __refresh_credentials(self):
+        import google.auth
+        from google.auth.transport.requests import Request as AuthRequest
+
+        if self.__credentials is None:
+            self.__credentials, self.__project = google.auth.default(
+                scopes=self.__SCOPES)
+        if not self.__credentials.valid:
+            self.__credentials.refresh(AuthRequest())
+
+    def __get_client(self) -> 'httpx.AsyncClient':
+        if self.__client is None:
+            import httpx
+
+            self.__client = httpx.AsyncClient(
+                timeout=self.__timeout,
+                limits=httpx.Limits(max_keepalive_connections=10),
+            )
+        return self.__client
+
+    def __instance_path(self, action: Optional[str] = None) -> str:
+        path = f'zones/{self.instance_zone}/instances/{self.instance_name}'
+        if action is not None:
+            path = f'{path}/{action}'
+        return path
+
+    def __operation_path(self, operation: str) -> str:
+        return f'zones/{self.instance_zone}/operations/{operation}'
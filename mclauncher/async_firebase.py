@@ -0,0 +1,70 @@
+'''Asyncio-native Firebase client for mclauncher'''
+
+from typing import Any, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from mclauncher.config import Config
+from mclauncher.firebase import AuthorizedUserLookups, Firebase, FirestoreOperations, normalize_email
+
+
+class AsyncFirebase(Firebase):
+    '''Firebase client with coroutine methods using Firestore's AsyncClient.'''
+
+    def __init__(self, config: Config):
+        super().__init__(config)
+        self.__lookups = AuthorizedUserLookups(config.authorized_users_cache_ttl)
+
+    def _create_firestore(self, credential: Any) -> Any:
+        from google.cloud.firestore import AsyncClient
+
+        return AsyncClient(
+            project=credential.project_id,
+            credentials=credential.get_credential(),
+        )
+
+    async def is_authorized_user(self, email: str) -> bool:
+        raw_email, email = email, normalize_email(email)
+
+        authorized = self.__lookups.get(email)
+        if authorized is None:
+            authorized = await self.__lookup_authorized_user(raw_email)
+            self.__lookups.set(email, authorized)
+        return authorized
+
+    async def count_consecutive_vacant(self, operations: Optional[FirestoreOperations] = None) -> int:
+        from google.cloud.firestore_v1 import transforms
+
+        result = await self._shutter_document().set(
+            {self._SHUTTER_VACANT_STREAK_KEY: transforms.Increment(1)},
+            merge=True,
+        )
+        self._count_operations(writes=1, operations=operations)
+        return result.transform_results[0].integer_value
+
+    async def reset_consecutive_vacant(self, operations: Optional[FirestoreOperations] = None) -> None:
+        doc_ref = self._shutter_document()
+
+        snapshot = await doc_ref.get()
+        self._count_operations(reads=1, operations=operations)
+        if snapshot.exists and snapshot.get(self._SHUTTER_VACANT_STREAK_KEY) == 0:
+            return
+
+        await doc_ref.set({self._SHUTTER_VACANT_STREAK_KEY: 0})
+        self._count_operations(writes=1, operations=operations)
+
+    async def verify_id_token(self, id_token: str) -> Any:
+        # Verification may fetch the public keys over blocking HTTP.
+        return await run_in_threadpool(super().verify_id_token, id_token)
+
+    async def __lookup_authorized_user(self, email: str) -> bool:
+        collection_ref = self._authorized_users_collection()
+
+        self._count_operations(reads=1)
+        if (await collection_ref.document(normalize_email(email)).get()).exists:
+            return True
+
+        self._count_operations(reads=1)
+        async for _ in self._legacy_authorized_user_query(email).stream():
+            return True
+        return False
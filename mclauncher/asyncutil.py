@@ -0,0 +1,18 @@
+'''Helpers to call backends from async code'''
+
+import inspect
+from typing import Any, Callable
+
+from starlette.concurrency import run_in_threadpool
+
+
+async def call(func: Callable[..., Any], *args, **kwargs) -> Any:
+    '''
+    Call func without blocking the event loop.
+
+    Coroutine functions are awaited directly and blocking functions run in
+    the thread pool, so sync and async backends can be used interchangeably.
+    '''
+    if inspect.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    return await run_in_threadpool(func, *args, **kwargs)
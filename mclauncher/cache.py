@@ -0,0 +1,60 @@
+'''Cache for values loaded from backends'''
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+
+T = TypeVar('T')
+
+
+class SingleFlightCache(Generic[T]):
+    '''
+    Serve a value from a short TTL cache.
+
+    Concurrent callers missing the cache share one in-flight load, so the
+    backend is called at most once per TTL however many clients poll.
+    '''
+
+    def __init__(self, load: Callable[[], Awaitable[T]], ttl: float):
+        self.__load = load
+        self.__ttl = ttl
+        self.__value: Optional[T] = None
+        self.__loaded_at = 0.0
+        self.__in_flight: Optional[asyncio.Future] = None
+        self.__generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self) -> T:
+        '''Return the cached value or load it.'''
+        if self.__value is not None and time.monotonic() - self.__loaded_at < self.__ttl:
+            self.hits += 1
+            return self.__value
+
+        if self.__in_flight is None:
+            self.misses += 1
+            self.__in_flight = asyncio.ensure_future(
+                self.__load_and_store(self.__generation))
+        else:
+            # Callers sharing the in-flight load don't call the backend.
+            self.hits += 1
+
+        return await asyncio.shield(self.__in_flight)
+
+    def invalidate(self):
+        '''Drop the cached value so that the next call loads it.'''
+        self.__generation += 1
+        self.__value = None
+        self.__in_flight = None
+
+    async def __load_and_store(self, generation: int) -> T:
+        try:
+            value = await self.__load()
+            if generation == self.__generation:
+                self.__value = value
+                self.__loaded_at = time.monotonic()
+            return value
+        finally:
+            if generation == self.__generation:
+                self.__in_flight = None
@@ -0,0 +1,172 @@
+'''Circuit breakers and concurrency limits of Minecraft probes'''
+
+import asyncio
+from logging import getLogger
+import time
+from typing import Callable, Optional
+
+from mclauncher.config import Config
+from mclauncher.minecraft import MinecraftProtocol
+
+
+logger = getLogger('uvicorn')
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(ConnectionError):
+    '''The server failed repeatedly and isn't called until the circuit closes.'''
+
+
+class CircuitBreaker:
+    '''
+    Fail fast after consecutive failures.
+
+    After failure_threshold consecutive failures the circuit opens and
+    calls fail with CircuitOpenError for reset_timeout seconds. Then one
+    trial call is let through (half-open), which closes the circuit if it
+    succeeds and opens it again if it fails.
+    '''
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.__failures = 0
+        self.__opened_at = 0.0
+
+    def before_call(self):
+        '''Raise CircuitOpenError unless a call is allowed now.'''
+        if self.state == STATE_CLOSED:
+            return
+
+        if self.state == STATE_OPEN \
+                and time.monotonic() - self.__opened_at >= self.reset_timeout:
+            self.state = STATE_HALF_OPEN
+            return
+
+        raise CircuitOpenError('circuit is open')
+
+    def record_success(self):
+        self.state = STATE_CLOSED
+        self.__failures = 0
+
+    def record_failure(self):
+        self.__failures += 1
+        if self.state == STATE_HALF_OPEN or self.__failures >= self.failure_threshold:
+            if self.state == STATE_CLOSED:
+                logger.warning('circuit of %s opened after %d failures',
+                               self.name, self.__failures)
+            self.state = STATE_OPEN
+            self.__opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        '''Let the next call try again if a trial call was cancelled.'''
+        if self.state == STATE_HALF_OPEN:
+            self.state = STATE_OPEN
+
+
+class GuardedConnection(MinecraftProtocol):
+    '''
+    Connection entered through the circuit breaker and the semaphore of its
+    server.
+
+    The outcome from entering to exiting the connection, including the
+    timeout of MinecraftConnection, is recorded to the circuit breaker.
+    '''
+
+    def __init__(
+        self,
+        connection: MinecraftProtocol,
+        breaker: CircuitBreaker,
+        semaphore: asyncio.Semaphore,
+    ):
+        self.__connection = connection
+        self.__breaker = breaker
+        self.__semaphore = semaphore
+
+    async def __aenter__(self) -> 'GuardedConnection':
+        self.__breaker.before_call()
+        try:
+            await self.__semaphore.acquire()
+        except BaseException:
+            self.__breaker.record_cancelled()
+            raise
+
+        try:
+            await self.__connection.__aenter__()
+        except BaseException as error:
+            self.__release(type(error))
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        error_type = exc_info[0]
+        try:
+            return await self.__connection.__aexit__(*exc_info)
+        except BaseException as error:
+            error_type = type(error)
+            raise
+        finally:
+            self.__release(error_type)
+
+    async def connect(self):
+        await self.__connection.connect()
+
+    async def close(self):
+        await self.__connection.close()
+
+    async def read(self, length: int) -> bytes:
+        return await self.__connection.read(length)
+
+    def write(self, data: bytes):
+        self.__connection.write(data)
+
+    def __release(self, error_type: Optional[type[BaseException]]):
+        self.__semaphore.release()
+        if error_type is None:
+            self.__breaker.record_success()
+        elif issubclass(error_type, Exception):
+            self.__breaker.record_failure()
+        else:
+            self.__breaker.record_cancelled()
+
+
+class MinecraftProbeGuard:
+    '''Wrap connect_minecraft with a circuit breaker and a semaphore per address.'''
+
+    def __init__(self, config: Config):
+        self.__concurrency = config.minecraft_probe_concurrency
+        self.__failure_threshold = config.minecraft_breaker_failure_threshold
+        self.__reset_timeout = config.minecraft_breaker_reset_timeout
+        self.__breakers: dict[str, CircuitBreaker] = {}
+        self.__semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def breaker(self, address: str) -> Optional[CircuitBreaker]:
+        '''Return the circuit breaker of the address if it has been probed.'''
+        return self.__breakers.get(address)
+
+    def reset(self, address: str):
+        '''Close the circuit of the address, e.g. once the server is known to answer.'''
+        breaker = self.__breakers.get(address)
+        if breaker is not None:
+            breaker.record_success()
+
+    def guard(
+        self,
+        connect_minecraft: Callable[[str], MinecraftProtocol],
+    ) -> Callable[[str], MinecraftProtocol]:
+        def connect(address: str) -> MinecraftProtocol:
+            breaker = self.__breakers.get(address)
+            if breaker is None:
+                breaker = self.__breakers[address] = CircuitBreaker(
+                    address, self.__failure_threshold, self.__reset_timeout)
+                self.__semaphores[address] = asyncio.Semaphore(self.__concurrency)
+
+            return GuardedConnection(
+                connect_minecraft(address), breaker, self.__semaphores[address])
+
+        return connect
@@ -1,82 +1,191 @@
+from functools import lru_cache
+import json
+import threading
 import time
-
-import googleapiclient.discovery
-import google.auth
+from typing import Any
 
 from mclauncher.config import Config
 
 from .instance import Instance
 
 
+# Partial response masks to get only the fields read by _to_instance
+INSTANCE_FIELDS = 'name,zone,status,networkInterfaces/accessConfigs/natIP'
+AGGREGATED_INSTANCES_FIELDS = f'items/*/instances({INSTANCE_FIELDS}),nextPageToken'
+
+
+def _to_instance(resource: dict) -> Instance:
+    '''Convert an instance resource of Compute Engine API to Instance.'''
+    address = None
+
+    if resource['status'] == 'RUNNING':
+        address = resource['networkInterfaces'][0]['accessConfigs'][0]['natIP']
+
+    return Instance(
+        address=address,
+        is_running=resource['status'] == 'RUNNING',
+        status=resource['status'],
+    )
+
+
+def _to_instances(response: dict) -> dict[tuple[str, str], Instance]:
+    '''Convert a response of instances.aggregatedList to Instances by (zone, name).'''
+    result = {}
+    for scope in response.get('items', {}).values():
+        for resource in scope.get('instances', []):
+            zone = resource['zone'].rsplit('/', 1)[-1]
+            result[(zone, resource['name'])] = _to_instance(resource)
+    return result
+
+
+def _stop_action(lifecycle: str) -> str:
+    '''Return the instance method to stop an instance with the lifecycle.'''
+    return 'suspend' if lifecycle == 'suspend' else 'stop'
+
+
+@lru_cache(maxsize=None)
+def _compute_discovery_document() -> dict:
+    '''
+    Return the discovery document of Compute Engine API v1.
+
+    The document bundled with google-api-python-client is parsed once per
+    process, so building clients neither fetches nor re-parses its 5 MB.
+    '''
+    from googleapiclient.discovery_cache import get_static_doc
+    return json.loads(get_static_doc('compute', 'v1'))
+
+
 class ComputeEngine:
+    '''
+    Compute Engine client
+
+    The API client is created on first use, and each thread executes
+    requests with its own HTTP client. With the suspend lifecycle,
+    instances are suspended instead of stopped.
+    '''
+
     def __init__(self, config: Config):
         self.instance_zone = config.instance_zone
         self.instance_name = config.instance_name
+        self.lifecycle = config.instance_lifecycle
+
+        self.__client: Any = None
+        self.__credentials: Any = None
+        self.__project: str = None
+        self.__client_lock = threading.Lock()
+        self.__local = threading.local()
 
-        credentials, self.project = google.auth.default()
-        self.__compute = googleapiclient.discovery.build(
-            'compute', 'v1', credentials=credentials)
+    @property
+    def project(self) -> str:
+        '''The project of the default credentials.'''
+        self.__compute()
+        return self.__project
 
     def get_instance(self) -> Instance:
-        request = self.__compute.instances().get(
+        request = self.__compute().instances().get(
             project=self.project,
             zone=self.instance_zone,
             instance=self.instance_name,
+            fields=INSTANCE_FIELDS,
         )
-        response = request.execute()
-
-        address = None
+        return _to_instance(request.execute(http=self.__http()))
 
-        if response['status'] == 'RUNNING':
-            address = response['networkInterfaces'][0]['accessConfigs'][0]['natIP']
-
-        return Instance(
-            address=address,
-            is_running=response['status'] == 'RUNNING'
-        )
+    def list_instances(self, label: str) -> dict[tuple[str, str], Instance]:
+        '''
+        Return instances having the label in all the zones by (zone, name).
 
-    def start_instance(self) -> bool:
-        request = self.__compute.instances().start(
+        It takes one call per page of 500 instances however many instances
+        the fleet has.
+        '''
+        instances = self.__compute().instances()
+        request = instances.aggregatedList(
             project=self.project,
-            zone=self.instance_zone,
-            instance=self.instance_name,
+            filter=f'labels.{label}:*',
+            fields=AGGREGATED_INSTANCES_FIELDS,
         )
-        result = request.execute()
 
-        while True:
-            if result['status'] == 'DONE':
-                if 'error' in result:
-                    raise Exception(result['error'])
-                break
+        result = {}
+        while request is not None:
+            response = request.execute(http=self.__http())
+            result.update(_to_instances(response))
+            request = instances.aggregatedList_next(request, response)
 
-            time.sleep(0.5)
-            result = self.__compute.zoneOperations().get(
-                project=self.project,
-                zone=self.instance_zone,
-                operation=result['name'],
-            ).execute()
+        return result
 
+    def start_instance(self) -> bool:
+        self._wait_operation(self.request_start_instance())
         return True
 
     def stop_instance(self) -> bool:
-        request = self.__compute.instances().stop(
+        self._wait_operation(self.request_stop_instance())
+        return True
+
+    def request_start_instance(self) -> dict:
+        '''
+        Request to start or resume the instance and return the operation
+        without waiting.
+        '''
+        action = 'resume' if self.get_instance().is_suspended else 'start'
+        return self.__request_instance(action)
+
+    def request_stop_instance(self) -> dict:
+        '''
+        Request to stop or suspend the instance and return the operation
+        without waiting.
+        '''
+        return self.__request_instance(_stop_action(self.lifecycle))
+
+    def get_operation(self, name: str) -> dict:
+        '''Return the zone operation.'''
+        return self.__compute().zoneOperations().get(
             project=self.project,
             zone=self.instance_zone,
-            instance=self.instance_name,
-        )
-        result = request.execute()
+            operation=name,
+        ).execute(http=self.__http())
 
+    def close(self):
+        '''Release resources held by the client.'''
+
+    def __request_instance(self, action: str) -> dict:
+        instances = self.__compute().instances()
+        return getattr(instances, action)(
+            project=self.project,
+            zone=self.instance_zone,
+            instance=self.instance_name,
+        ).execute(http=self.__http())
+
+    def __compute(self) -> Any:
+        if self.__client is not None:
+            return self.__client
+
+        with self.__client_lock:
+            if self.__client is None:
+                import google.auth
+                import googleapiclient.discovery
+
+                self.__credentials, self.__project = google.auth.default()
+                self.__client = googleapiclient.discovery.build_from_document(
+                    _compute_discovery_document(), credentials=self.__credentials)
+        return self.__client
+
+    def __http(self) -> Any:
+        '''Return the authorized HTTP client of the current thread.'''
+        http = getattr(self.__local, 'http', None)
+        if http is None:
+            import google_auth_httplib2
+            from googleapiclient.http import build_http
+
+            self.__compute()
+            http = self.__local.http = google_auth_httplib2.AuthorizedHttp(
+                self.__credentials, http=build_http())
+        return http
+
+    def _wait_operation(self, result: dict) -> dict:
         while True:
             if result['status'] == 'DONE':
                 if 'error' in result:
                     raise Exception(result['error'])
-                break
+                return result
 
             time.sleep(0.5)
-            result = self.__compute.zoneOperations().get(
-                project=self.project,
-                zone=self.instance_zone,
-                operation=result['name'],
-            ).execute()
-
-        return True
+            result = self.get_operation(result['name'])
@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic import BaseSettings, Field
 
 
@@ -8,9 +10,63 @@ class Config(BaseSettings):
     firebase_credentials_json: str = Field(
         env='firebase_credentials_json', default=None)
 
+    authorized_users_cache_ttl: float = Field(
+        env='authorized_users_cache_ttl', default=60.0)
+    authorized_users_watch: bool = Field(
+        env='authorized_users_watch', default=True)
+
+    id_token_cache_size: int = Field(env='id_token_cache_size', default=1024)
+    id_token_cache_ttl: Optional[float] = Field(
+        env='id_token_cache_ttl', default=None)
+
     shutter_authorized_email: str = Field(env='shutter_authorized_email')
     shutter_count_to_shutdown: int = Field(
         env='shutter_count_to_shutdown', default=2)
 
     instance_zone: str = Field(env='instance_zone')
     instance_name: str = Field(env='instance_name')
+    instance_lifecycle: Literal['stop', 'suspend'] = Field(
+        env='instance_lifecycle', default='stop')
+
+    fleet_json: str = Field(env='fleet_json', default='[]')
+    fleet_concurrency: int = Field(env='fleet_concurrency', default=8)
+    instance_label: Optional[str] = Field(env='instance_label', default=None)
+
+    minecraft_query: bool = Field(env='minecraft_query', default=False)
+    minecraft_query_port: Optional[int] = Field(
+        env='minecraft_query_port', default=None)
+    minecraft_ping: bool = Field(env='minecraft_ping', default=True)
+    minecraft_probe_concurrency: int = Field(
+        env='minecraft_probe_concurrency', default=2)
+    minecraft_breaker_failure_threshold: int = Field(
+        env='minecraft_breaker_failure_threshold', default=3)
+    minecraft_breaker_reset_timeout: float = Field(
+        env='minecraft_breaker_reset_timeout', default=30.0)
+
+    server_status_ttl: float = Field(env='server_status_ttl', default=2.0)
+    server_status_poll_interval: float = Field(
+        env='server_status_poll_interval', default=5.0)
+
+    operation_poll_interval: float = Field(
+        env='operation_poll_interval', default=0.5)
+    operation_poll_max_interval: float = Field(
+        env='operation_poll_max_interval', default=5.0)
+    operation_deadline: float = Field(env='operation_deadline', default=300.0)
+
+    readiness_poll_interval: float = Field(
+        env='readiness_poll_interval', default=1.0)
+    readiness_poll_max_interval: float = Field(
+        env='readiness_poll_max_interval', default=10.0)
+    readiness_deadline: float = Field(env='readiness_deadline', default=600.0)
+
+    metrics_token: Optional[str] = Field(env='metrics_token', default=None)
+
+    profiling: bool = Field(env='profiling', default=False)
+    profiling_sample_rate: float = Field(
+        env='profiling_sample_rate', default=0.0)
+    profiling_directory: Optional[str] = Field(
+        env='profiling_directory', default=None)
+
+    async_compute_engine: bool = Field(
+        env='async_compute_engine', default=False)
+    async_firebase: bool = Field(env='async_firebase', default=False)
@@ -1,54 +1,255 @@
 '''Firebase client for mclauncher'''
 
 
+from collections import OrderedDict
+from dataclasses import dataclass
 import json
-from typing import Any
-from firebase_admin import initialize_app, credentials, firestore, auth
-from google.cloud.firestore_v1 import transforms
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Optional
 
 from mclauncher.config import Config
 
+if TYPE_CHECKING:
+    from google.cloud.firestore_v1.watch import Watch
+
+
+# Firestore accepts up to 500 writes in a batch.
+FIRESTORE_MAX_BATCH_WRITES = 500
+
+
+def normalize_email(email: str) -> str:
+    '''Normalize an email into the ID of its authorized_users document.'''
+    return email.strip().lower()
+
+
+@dataclass
+class FirestoreOperations:
+    '''Counts of Firestore operations issued by a call.'''
+    reads: int = 0
+    writes: int = 0
+
+
+class AuthorizedUserLookups:
+    '''
+    Results of allowlist lookups cached for ttl seconds.
+
+    It's called from the thread pool, so the results are guarded by a lock.
+    '''
+
+    __MAX_SIZE = 1024
+
+    def __init__(self, ttl: float):
+        self.__ttl = ttl
+        self.__results: OrderedDict[str, tuple[bool, float]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, email: str) -> Optional[bool]:
+        '''Return the cached result or None.'''
+        with self.__lock:
+            result = self.__results.get(email)
+        if result is None or result[1] <= time.monotonic():
+            return None
+        return result[0]
+
+    def set(self, email: str, authorized: bool):
+        '''Cache the result.'''
+        with self.__lock:
+            self.__results.pop(email, None)
+            if len(self.__results) >= self.__MAX_SIZE:
+                self.__results.popitem(last=False)
+            self.__results[email] = (authorized, time.monotonic() + self.__ttl)
+
 
 class Firebase:
-    __AUTHORIZED_USERS_COLLECTION = 'authorized_users'
-    __SHUTTER_COLLECTION = 'shutter'
-    __SHUTTER_DOCUMENT = 'shutter'
-    __SHUTTER_VACANT_STREAK_KEY = 'vacant_streak'
+    '''
+    Firebase client
+
+    authorized_users documents are keyed by normalized emails. The allowlist
+    is kept in memory while the snapshot listener is active, otherwise each
+    email is looked up and cached for authorized_users_cache_ttl.
+    '''
+
+    _AUTHORIZED_USERS_COLLECTION = 'authorized_users'
+    _SHUTTER_COLLECTION = 'shutter'
+    _SHUTTER_DOCUMENT = 'shutter'
+    _SHUTTER_VACANT_STREAK_KEY = 'vacant_streak'
+
+    # Counts of Firestore operations issued by this client
+    firestore_reads = 0
+    firestore_writes = 0
+
+    # The default app of firebase_admin is shared by all the clients.
+    __app_lock = threading.Lock()
+    __app_initialized = False
 
     def __init__(self, config: Config):
-        credential = credentials.Certificate(
-            json.loads(config.firebase_credentials_json))
-        initialize_app(credential=credential)
+        self.__credentials_json = config.firebase_credentials_json
+        self.__client: Any = None
+        self.__client_lock = threading.Lock()
+
+        self.__authorized_users: Optional[frozenset[str]] = None
+        self.__authorized_users_lock = threading.Lock()
+        self.__authorized_users_watch: Optional['Watch'] = None
+        self.__watch_pending = config.authorized_users_watch
+        self.__watch_lock = threading.Lock()
+        self.__lookups = AuthorizedUserLookups(config.authorized_users_cache_ttl)
+        self.__operations_lock = threading.Lock()
+
+    @property
+    def _firestore(self) -> Any:
+        '''The Firestore client, created on first use.'''
+        if self.__client is not None:
+            return self.__client
+
+        with self.__client_lock:
+            if self.__client is None:
+                self.__client = self._create_firestore(self._initialize_app())
+        return self.__client
+
+    def _initialize_app(self) -> Any:
+        '''Initialize the default app of firebase_admin once and return its credential.'''
+        from firebase_admin import credentials, get_app, initialize_app
+
+        with Firebase.__app_lock:
+            if not Firebase.__app_initialized:
+                initialize_app(credential=credentials.Certificate(
+                    json.loads(self.__credentials_json)))
+                Firebase.__app_initialized = True
+            return get_app().credential
 
-        self._firestore = firestore.client()
+    def _create_firestore(self, credential: Any) -> Any:
+        from firebase_admin import firestore
+        return firestore.client()
 
     def is_authorized_user(self, email: str) -> bool:
-        return any(
-            authorized_email == email for authorized_email in self._authorized_users()
-        )
+        raw_email, email = email, normalize_email(email)
+
+        if self.__watch_pending:
+            with self.__watch_lock:
+                if self.__watch_pending:
+                    self.__watch_authorized_users()
+                    self.__watch_pending = False
+
+        watch = self.__authorized_users_watch
+        if watch is not None and watch.is_active:
+            return email in self._authorized_users()
 
-    def count_consecutive_vacant(self) -> int:
-        collection_ref = self._firestore.collection(self.__SHUTTER_COLLECTION)
-        doc_ref = collection_ref.document(self.__SHUTTER_DOCUMENT)
+        authorized = self.__lookups.get(email)
+        if authorized is None:
+            authorized = self.__lookup_authorized_user(raw_email)
+            self.__lookups.set(email, authorized)
+        return authorized
 
-        if not doc_ref.get().exists:
-            self.reset_consecutive_vacant()
+    def count_consecutive_vacant(self, operations: Optional[FirestoreOperations] = None) -> int:
+        '''
+        Increment the vacant streak and return it with one write.
+
+        The document is created if it doesn't exist, and the incremented
+        value is read from the result of the transform. The write is also
+        counted to operations if it's given.
+        '''
+        from google.cloud.firestore_v1 import transforms
+
+        result = self._shutter_document().set(
+            {self._SHUTTER_VACANT_STREAK_KEY: transforms.Increment(1)},
+            merge=True,
+        )
+        self._count_operations(writes=1, operations=operations)
+        return result.transform_results[0].integer_value
 
-        doc_ref.update(
-            {self.__SHUTTER_VACANT_STREAK_KEY: transforms.Increment(1)})
+    def reset_consecutive_vacant(self, operations: Optional[FirestoreOperations] = None) -> None:
+        '''Reset the vacant streak unless it is already 0.'''
+        doc_ref = self._shutter_document()
 
-        return doc_ref.get().get(self.__SHUTTER_VACANT_STREAK_KEY)
+        snapshot = doc_ref.get()
+        self._count_operations(reads=1, operations=operations)
+        if snapshot.exists and snapshot.get(self._SHUTTER_VACANT_STREAK_KEY) == 0:
+            return
 
-    def reset_consecutive_vacant(self) -> None:
-        collection_ref = self._firestore.collection(self.__SHUTTER_COLLECTION)
-        doc_ref = collection_ref.document(self.__SHUTTER_DOCUMENT)
-        doc_ref.set({self.__SHUTTER_VACANT_STREAK_KEY: 0})
+        doc_ref.set({self._SHUTTER_VACANT_STREAK_KEY: 0})
+        self._count_operations(writes=1, operations=operations)
 
     def verify_id_token(self, id_token: str) -> Any:
+        from firebase_admin import auth
+
+        self._initialize_app()
         return auth.verify_id_token(id_token)
 
-    def _authorized_users(self) -> list[str]:
-        doc_ref = self._firestore.collection(
-            self.__AUTHORIZED_USERS_COLLECTION
-        )
-        return [user.get('email') for user in doc_ref.stream()]
+    def _count_operations(
+        self,
+        reads: int = 0,
+        writes: int = 0,
+        operations: Optional[FirestoreOperations] = None,
+    ):
+        '''Count Firestore operations to this client and to operations if it's given.'''
+        with self.__operations_lock:
+            self.firestore_reads += reads
+            self.firestore_writes += writes
+
+        if operations is not None:
+            operations.reads += reads
+            operations.writes += writes
+
+    def _shutter_document(self):
+        return self._firestore.collection(self._SHUTTER_COLLECTION) \
+            .document(self._SHUTTER_DOCUMENT)
+
+    def _authorized_users(self) -> frozenset[str]:
+        '''Return the allowlist kept by the snapshot listener.'''
+        users = self.__authorized_users
+        if users is not None:
+            return users
+
+        with self.__authorized_users_lock:
+            if self.__authorized_users is None:
+                self.__set_authorized_users(
+                    [user.get('email') for user in self._authorized_users_collection().stream()])
+                self._count_operations(reads=max(len(self.__authorized_users), 1))
+            return self.__authorized_users
+
+    def _authorized_users_collection(self):
+        return self._firestore.collection(self._AUTHORIZED_USERS_COLLECTION)
+
+    def _legacy_authorized_user_query(self, email: str):
+        '''
+        Query documents added with random IDs before they were keyed by email.
+
+        The old tool stored emails as they were given, so the email is
+        matched both as it is and normalized.
+        '''
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        emails = list(dict.fromkeys([email, normalize_email(email)]))
+        return self._authorized_users_collection() \
+            .where(filter=FieldFilter('email', 'in', emails)).limit(1)
+
+    def __lookup_authorized_user(self, email: str) -> bool:
+        collection_ref = self._authorized_users_collection()
+
+        self._count_operations(reads=1)
+        if collection_ref.document(normalize_email(email)).get().exists:
+            return True
+
+        self._count_operations(reads=1)
+        return any(True for _ in self._legacy_authorized_user_query(email).stream())
+
+    def __set_authorized_users(self, emails: list[str]):
+        self.__authorized_users = frozenset(
+            normalize_email(email) for email in emails)
+
+    def __watch_authorized_users(self):
+        '''Keep the allowlist cache coherent with a Firestore snapshot listener.'''
+        collection_ref = self._authorized_users_collection()
+
+        def on_snapshot(documents, _changes, _read_time):
+            emails = [document.get('email') for document in documents]
+            with self.__authorized_users_lock:
+                self.__set_authorized_users(emails)
+
+        try:
+            self.__authorized_users_watch = collection_ref.on_snapshot(
+                on_snapshot)
+        except Exception:
+            # Fall back to the lookups of each email.
+            self.__authorized_users_watch = None
@@ -0,0 +1,168 @@
+'''Registry of Minecraft servers managed by mclauncher'''
+
+import asyncio
+from dataclasses import dataclass
+import json
+from logging import getLogger
+from typing import Callable, Optional, Union
+
+from mclauncher.asyncutil import call
+from mclauncher.cache import SingleFlightCache
+from mclauncher.compute_engine import ComputeEngine
+from mclauncher.config import Config
+from mclauncher.instance import Instance
+from mclauncher.minecraft import MinecraftProtocol
+from mclauncher.minecraft_query import MinecraftQuery
+from mclauncher.server_status import ServerStatus, ServerStatusCache, probe_server
+
+
+logger = getLogger('uvicorn')
+
+
+@dataclass(frozen=True)
+class FleetServer:
+    '''A Minecraft server running on an instance.'''
+    name: str
+    compute_engine: ComputeEngine
+    status_cache: ServerStatusCache
+
+
+class InstanceDirectory:
+    '''
+    Instances of the fleet listed with one instances.aggregatedList call
+
+    Concurrent probes of the fleet share one listing of the instances
+    having the label, cached for ttl seconds.
+    '''
+
+    def __init__(self, compute_engine: ComputeEngine, label: str, ttl: float):
+        self.__instances = SingleFlightCache(
+            load=lambda: call(compute_engine.list_instances, label),
+            ttl=ttl,
+        )
+
+    async def get_instance(self, compute_engine: ComputeEngine) -> Instance:
+        '''Return the instance of compute_engine from the listing.'''
+        instances = await self.__instances.get()
+        instance = instances.get(
+            (compute_engine.instance_zone, compute_engine.instance_name))
+
+        if instance is None:
+            # The instance doesn't have the label.
+            return await call(compute_engine.get_instance)
+
+        return instance
+
+
+class Fleet:
+    '''
+    Servers of the fleet
+
+    Statuses of all the servers are probed concurrently with at most
+    concurrency probes in flight.
+    '''
+
+    def __init__(self, servers: list[FleetServer], concurrency: int):
+        self.servers = servers
+        self.__servers = {server.name: server for server in servers}
+        self.__concurrency = concurrency
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Config,
+        compute_engine_class: type[ComputeEngine],
+        connect_minecraft: Callable[[str], MinecraftProtocol],
+        compute_engine: ComputeEngine,
+        status_cache: ServerStatusCache,
+        query: Optional[Callable[[str], MinecraftQuery]] = None,
+    ) -> 'Fleet':
+        '''
+        Create the fleet of the configured instance and the ones in fleet_json.
+
+        fleet_json is a JSON list of objects with name, instance_zone and
+        instance_name. The configured instance reuses compute_engine and
+        status_cache. If instance_label is set, the other instances are
+        listed at once by the label.
+        '''
+        directory = None
+        if config.instance_label:
+            directory = InstanceDirectory(
+                compute_engine=compute_engine,
+                label=config.instance_label,
+                ttl=config.server_status_ttl,
+            )
+
+        servers = [FleetServer(
+            name=config.instance_name,
+            compute_engine=compute_engine,
+            status_cache=status_cache,
+        )]
+
+        for server in json.loads(config.fleet_json):
+            if (server['instance_zone'], server['instance_name']) == \
+                    (config.instance_zone, config.instance_name):
+                servers[0] = FleetServer(
+                    name=server['name'],
+                    compute_engine=compute_engine,
+                    status_cache=status_cache,
+                )
+                continue
+
+            server_compute_engine = compute_engine_class(config.copy(update={
+                'instance_zone': server['instance_zone'],
+                'instance_name': server['instance_name'],
+            }))
+            servers.append(FleetServer(
+                name=server['name'],
+                compute_engine=server_compute_engine,
+                status_cache=ServerStatusCache(
+                    probe=_prober(
+                        server_compute_engine, directory, connect_minecraft,
+                        ping=config.minecraft_ping,
+                        query=query,
+                    ),
+                    ttl=config.server_status_ttl,
+                ),
+            ))
+
+        return cls(servers, concurrency=config.fleet_concurrency)
+
+    def get(self, name: str) -> Optional[FleetServer]:
+        '''Return the server named name.'''
+        return self.__servers.get(name)
+
+    async def statuses(self) -> list[tuple[FleetServer, Union[ServerStatus, Exception]]]:
+        '''Probe all the servers. Failed probes are returned as exceptions.'''
+        semaphore = asyncio.Semaphore(self.__concurrency)
+
+        async def probe(server: FleetServer) -> Union[ServerStatus, Exception]:
+            async with semaphore:
+                try:
+                    return await server.status_cache.get()
+                except Exception as error:
+                    logger.error('getting status of %s: %r', server.name, error)
+                    return error
+
+        results = await asyncio.gather(*(probe(server) for server in self.servers))
+        return list(zip(self.servers, results))
+
+    async def close(self):
+        '''Close the clients of all the servers.'''
+        for server in self.servers:
+            await call(server.compute_engine.close)
+
+
+def _prober(
+    compute_engine: ComputeEngine,
+    directory: Optional[InstanceDirectory],
+    connect_minecraft: Callable[[str], MinecraftProtocol],
+    ping: bool = False,
+    query: Optional[Callable[[str], MinecraftQuery]] = None,
+):
+    if directory is None:
+        return lambda: probe_server(
+            lambda: call(compute_engine.get_instance), connect_minecraft, ping, query)
+
+    return lambda: probe_server(
+        lambda: directory.get_instance(compute_engine), connect_minecraft, ping, query)
@@ -0,0 +1,85 @@
+'''LRU cache for verified ID token claims'''
+
+from collections import OrderedDict
+from hashlib import sha256
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from mclauncher.asyncutil import call
+
+
+class IdTokenCache:
+    '''
+    Cache decoded claims of verified ID tokens until they expire.
+
+    Entries are keyed by a hash of the token so raw tokens are never kept
+    in memory. Tokens without an exp claim are not cached. verify_id_token
+    may be a coroutine function.
+    '''
+
+    def __init__(
+        self,
+        verify_id_token: Callable[[str], Any],
+        max_size: int = 1024,
+        ttl: Optional[float] = None,
+    ):
+        self.__verify_id_token = verify_id_token
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__entries: OrderedDict[bytes, tuple[Any, float]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    async def verify_id_token(self, id_token: str) -> Any:
+        '''Return cached claims or verify the token and cache its claims.'''
+        if self.max_size <= 0:
+            return await call(self.__verify_id_token, id_token)
+
+        key = sha256(id_token.encode('utf8')).digest()
+        now = time.time()
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                claims, expires_at = entry
+                if now < expires_at:
+                    self.__entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                del self.__entries[key]
+            self.misses += 1
+
+        claims = await call(self.__verify_id_token, id_token)
+
+        expires_at = self.__expires_at(claims, now)
+        if expires_at is None or expires_at <= now:
+            return claims
+
+        with self.__lock:
+            self.__entries[key] = (claims, expires_at)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+        return claims
+
+    def clear(self):
+        '''Drop all the cached claims.'''
+        with self.__lock:
+            self.__entries.clear()
+
+    def __expires_at(self, claims: Any, now: float) -> Optional[float]:
+        try:
+            expires_at = float(claims['exp'])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        if self.ttl is not None:
+            expires_at = min(expires_at, now + self.ttl)
+
+        return expires_at
+
+    def __len__(self) -> int:
+        return len(self.__entries)
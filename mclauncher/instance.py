@@ -1,7 +1,19 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass(frozen=True)
 class Instance:
     address: str
     is_running: bool
+    status: Optional[str] = None
+
+    @property
+    def is_suspended(self) -> bool:
+        '''The instance is suspended and can be resumed.'''
+        return self.status == 'SUSPENDED'
+
+    @property
+    def is_suspending(self) -> bool:
+        '''The instance is being suspended and can't be resumed yet.'''
+        return self.status == 'SUSPENDING'
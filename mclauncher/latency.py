@@ -0,0 +1,64 @@
+'''Rolling histogram of ping latencies'''
+
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class LatencySnapshot:
+    '''Latencies in a window of recent samples.'''
+    count: int
+    buckets: list[tuple[float, int]]
+    p50: Optional[float]
+    p90: Optional[float]
+    p99: Optional[float]
+    last: Optional[float]
+
+
+class LatencyHistogram:
+    '''
+    Histogram of the last window samples.
+
+    Samples are kept in a ring buffer, so old samples fall out of the
+    histogram instead of outweighing the recent ones.
+    '''
+
+    # Upper bounds of the buckets in seconds
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, float('inf'))
+
+    def __init__(self, window: int = 256):
+        self.__samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.__samples.append(seconds)
+
+    def snapshot(self) -> LatencySnapshot:
+        samples = sorted(self.__samples)
+
+        counts = [0] * len(self.BUCKETS)
+        for sample in samples:
+            counts[bisect_left(self.BUCKETS, sample)] += 1
+
+        # Buckets are cumulative like Prometheus histograms.
+        buckets, total = [], 0
+        for bound, count in zip(self.BUCKETS, counts):
+            total += count
+            buckets.append((bound, total))
+
+        return LatencySnapshot(
+            count=len(samples),
+            buckets=buckets,
+            p50=_percentile(samples, 0.5),
+            p90=_percentile(samples, 0.9),
+            p99=_percentile(samples, 0.99),
+            last=self.__samples[-1] if self.__samples else None,
+        )
+
+
+def _percentile(samples: list[float], fraction: float) -> Optional[float]:
+    '''Return the nearest-rank percentile of sorted samples.'''
+    if not samples:
+        return None
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
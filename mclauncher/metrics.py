@@ -0,0 +1,288 @@
+'''Metrics of external dependencies in the Prometheus text format'''
+
+from bisect import bisect_left
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from mclauncher.minecraft import MinecraftProtocol
+
+
+# Labels and value of a sample
+Sample = tuple[dict[str, str], float]
+
+
+class Counter:
+    '''Counters of label values.'''
+
+    def __init__(self):
+        self.__values: dict[tuple[str, ...], float] = {}
+        self.__lock = threading.Lock()
+
+    def inc(self, labels: tuple[str, ...], value: float = 1):
+        with self.__lock:
+            self.__values[labels] = self.__values.get(labels, 0) + value
+
+    def collect(self) -> dict[tuple[str, ...], float]:
+        with self.__lock:
+            return dict(self.__values)
+
+
+class Histogram:
+    '''
+    Fixed-bucket histograms of label values.
+
+    An observation is a bisect and two additions, and the counts are only
+    made cumulative when they are collected.
+    '''
+
+    # Upper bounds of the buckets in seconds. Starting an instance waits
+    # for its operation, so the buckets go up to minutes.
+    BUCKETS = (
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+        60.0, 120.0, float('inf'),
+    )
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        # Counts of each bucket followed by the sum
+        self.__series: dict[tuple[str, ...], list[float]] = {}
+        self.__lock = threading.Lock()
+
+    def observe(self, labels: tuple[str, ...], value: float):
+        index = bisect_left(self.buckets, value)
+        with self.__lock:
+            series = self.__series.get(labels)
+            if series is None:
+                series = self.__series[labels] = [0] * (len(self.buckets) + 1)
+            series[index] += 1
+            series[-1] += value
+
+    def collect(self) -> dict[tuple[str, ...], tuple[list[int], float]]:
+        '''Return the cumulative counts and the sum of each label values.'''
+        with self.__lock:
+            series = {labels: list(values) for labels, values in self.__series.items()}
+
+        collected = {}
+        for labels, values in series.items():
+            counts, total = [], 0
+            for count in values[:-1]:
+                total += count
+                counts.append(total)
+            collected[labels] = (counts, values[-1])
+        return collected
+
+
+class Metrics:
+    '''
+    Durations and errors of the calls to external dependencies
+
+    Calls are timed by wrapping the backends with instrument_class,
+    callables with timed and Minecraft connections with
+    instrument_connection. Values owned by other objects, like hit counts
+    of caches, are read by collectors only when the metrics are rendered.
+    '''
+
+    __CALL_LABELS = ('dependency', 'method')
+    __ERROR_LABELS = ('dependency', 'method', 'error')
+
+    def __init__(self):
+        self.calls = Histogram()
+        self.errors = Counter()
+        self.__collectors: list[tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+
+    def observe(
+        self,
+        dependency: str,
+        method: str,
+        seconds: float,
+        error: Optional[BaseException] = None,
+    ):
+        '''Record a call to the dependency.'''
+        self.calls.observe((dependency, method), seconds)
+        if error is not None:
+            self.errors.inc((dependency, method, type(error).__name__))
+
+    def register(
+        self,
+        name: str,
+        type_: str,
+        help_: str,
+        collect: Callable[[], Iterable[Sample]],
+    ):
+        '''Render the samples returned by collect as a metric.'''
+        self.__collectors.append((name, type_, help_, collect))
+
+    def register_cache(self, name: str, cache: Any, **labels: str):
+        '''Render hits and misses attributes of the cache and their ratio.'''
+        labels = {'cache': name, **labels}
+
+        def requests() -> Iterable[Sample]:
+            yield {**labels, 'result': 'hit'}, cache.hits
+            yield {**labels, 'result': 'miss'}, cache.misses
+
+        def hit_ratio() -> Iterable[Sample]:
+            total = cache.hits + cache.misses
+            if total > 0:
+                yield labels, cache.hits / total
+
+        self.register(
+            'mclauncher_cache_requests_total', 'counter',
+            'Requests to the caches of the dependencies.', requests)
+        self.register(
+            'mclauncher_cache_hit_ratio', 'gauge',
+            'Ratio of requests to the caches served without the dependency.',
+            hit_ratio)
+
+    def timed(self, dependency: str, method: str, func: Callable) -> Callable:
+        '''Wrap func to time its calls. Coroutine functions stay coroutine functions.'''
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed_coroutine(*args, **kwargs):
+                started_at, error = time.perf_counter(), None
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    self.observe(dependency, method, time.perf_counter() - started_at, error)
+
+            return timed_coroutine
+
+        @functools.wraps(func)
+        def timed_function(*args, **kwargs):
+            started_at, error = time.perf_counter(), None
+            try:
+                return func(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self.observe(dependency, method, time.perf_counter() - started_at, error)
+
+        return timed_function
+
+    def instrument_class(self, cls: type, dependency: str) -> type:
+        '''Return a subclass of cls timing calls of its public methods.'''
+        methods = {}
+        for name in dir(cls):
+            if name.startswith('_'):
+                continue
+            method = inspect.getattr_static(cls, name)
+            if inspect.isfunction(method):
+                methods[name] = self.timed(dependency, name, method)
+
+        return type(cls.__name__, (cls,), {
+            **methods,
+            '__module__': cls.__module__,
+            '__qualname__': cls.__qualname__,
+        })
+
+    def instrument_connection(
+        self,
+        connect_minecraft: Callable[[str], MinecraftProtocol],
+    ) -> Callable[[str], MinecraftProtocol]:
+        '''Wrap connect_minecraft to time connections from entering to exiting.'''
+        def connect(address: str) -> MinecraftProtocol:
+            return TimedConnection(connect_minecraft(address), self)
+
+        return connect
+
+    def render(self) -> str:
+        '''Return the metrics in the Prometheus text format.'''
+        lines = [
+            '# HELP mclauncher_dependency_call_seconds Duration of calls to external dependencies.',
+            '# TYPE mclauncher_dependency_call_seconds histogram',
+        ]
+        bounds = [_format_bound(bound) for bound in self.calls.buckets]
+        for labels, (counts, total) in sorted(self.calls.collect().items()):
+            labels = dict(zip(self.__CALL_LABELS, labels))
+            for bound, count in zip(bounds, counts):
+                lines.append(
+                    f'mclauncher_dependency_call_seconds_bucket{_format_labels({**labels, "le": bound})} {count}')
+            lines.append(f'mclauncher_dependency_call_seconds_sum{_format_labels(labels)} {total!r}')
+            lines.append(f'mclauncher_dependency_call_seconds_count{_format_labels(labels)} {counts[-1]}')
+
+        lines.append('# HELP mclauncher_dependency_errors_total Calls to external dependencies which raised.')
+        lines.append('# TYPE mclauncher_dependency_errors_total counter')
+        for labels, value in sorted(self.errors.collect().items()):
+            labels = dict(zip(self.__ERROR_LABELS, labels))
+            lines.append(f'mclauncher_dependency_errors_total{_format_labels(labels)} {value:g}')
+
+        # Collectors registered under the same name are rendered as one metric.
+        families: dict[str, list] = {}
+        for name, type_, help_, collect in self.__collectors:
+            family = families.setdefault(name, [type_, help_, []])
+            family[2].append(collect)
+
+        for name, (type_, help_, collects) in families.items():
+            lines.append(f'# HELP {name} {help_}')
+            lines.append(f'# TYPE {name} {type_}')
+            for collect in collects:
+                for labels, value in collect():
+                    lines.append(f'{name}{_format_labels(labels)} {value!r}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class TimedConnection(MinecraftProtocol):
+    '''Connection recording the time from entering to exiting as minecraft/status.'''
+
+    def __init__(self, connection: MinecraftProtocol, metrics: Metrics):
+        self.__connection = connection
+        self.__metrics = metrics
+        self.__entered_at = 0.0
+
+    async def __aenter__(self) -> 'TimedConnection':
+        self.__entered_at = time.perf_counter()
+        try:
+            await self.__connection.__aenter__()
+        except BaseException as error:
+            self.__observe(error)
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        error = exc_info[1]
+        try:
+            return await self.__connection.__aexit__(*exc_info)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.__observe(error)
+
+    async def connect(self):
+        await self.__connection.connect()
+
+    async def close(self):
+        await self.__connection.close()
+
+    async def read(self, length: int) -> bytes:
+        return await self.__connection.read(length)
+
+    def write(self, data: bytes):
+        self.__connection.write(data)
+
+    def __observe(self, error: Optional[BaseException]):
+        self.__metrics.observe(
+            'minecraft', 'status', time.perf_counter() - self.__entered_at, error)
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+    return '{' + pairs + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
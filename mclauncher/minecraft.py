@@ -2,26 +2,99 @@
 
 from abc import ABCMeta, abstractmethod
 from asyncio.streams import StreamReader, StreamWriter
+from contextlib import AsyncExitStack
 from ctypes import c_uint32 as uint32
 from ctypes import c_int32 as int32
 import asyncio
 import json
+from json.decoder import scanstring
+import re
 import struct
+import time
+from typing import Container, Optional
+
+from anyio import fail_after
 
 
 class TooLongVarInt(Exception):
     pass
 
 
+# Encoded var ints of values which fit in a single byte
+_SMALL_VARINTS = tuple(bytes((value,)) for value in range(0x80))
+
+
+def encode_varint(data: int) -> bytes:
+    '''Encode a var int into bytes.'''
+    if 0 <= data < 0x80:
+        return _SMALL_VARINTS[data]
+
+    data = uint32(data).value
+    encoded = bytearray()
+    while data & ~0x7F != 0:
+        encoded.append(data & 0x7F | 0x80)
+        data >>= 7
+    encoded.append(data)
+    return bytes(encoded)
+
+
+class MinecraftPacket:
+    '''
+    Builder of a packet
+
+    Fields are encoded into a single buffer and build() frames it with the
+    length prefix, so a packet is sent with one write.
+    '''
+
+    def __init__(self, packet_id: int):
+        self.__payload = bytearray(encode_varint(packet_id))
+
+    def varint(self, data: int) -> 'MinecraftPacket':
+        '''Append a var int.'''
+        self.__payload += encode_varint(data)
+        return self
+
+    def ushort(self, data: int) -> 'MinecraftPacket':
+        '''Append an unsigned short (2 bytes).'''
+        self.__payload += struct.pack('>H', data)
+        return self
+
+    def long(self, data: int) -> 'MinecraftPacket':
+        '''Append a signed long (8 bytes).'''
+        self.__payload += struct.pack('>q', data)
+        return self
+
+    def string(self, data: str) -> 'MinecraftPacket':
+        '''Append a string.'''
+        encoded = data.encode('utf8')
+        self.__payload += encode_varint(len(encoded))
+        self.__payload += encoded
+        return self
+
+    def build(self) -> bytes:
+        '''Return the packet prefixed with its length.'''
+        return encode_varint(len(self.__payload)) + self.__payload
+
+
 class MinecraftProtocol(metaclass=ABCMeta):
     @abstractmethod
     async def connect(self):
         '''Connect to the server'''
         ...
 
+    async def close(self):
+        '''Close the connection'''
+
+    async def __aenter__(self) -> 'MinecraftProtocol':
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
     @abstractmethod
     async def read(self, length: int) -> bytes:
-        '''Read bytes'''
+        '''Read bytes. Implementations may return a bytes-like object.'''
         ...
 
     @abstractmethod
@@ -54,51 +127,74 @@ class MinecraftProtocol(metaclass=ABCMeta):
 
     def write_varint(self, data: int):
         '''Write a var int'''
-        data = uint32(data).value
-        for _ in range(5):
-            if data & ~0x7f == 0:
-                self.write_byte(data)
-                return
-
-            self.write_byte(data & 0x7F | 0x80)
-            data >>= 7
+        self.write(encode_varint(data))
 
     async def read_string(self) -> str:
         '''Read a string.'''
         length = await self.read_varint()
-        return (await self.read(length)).decode('utf8')
+        return str(await self.read(length), 'utf8')
 
     def write_string(self, data: str):
         '''Write a string'''
-        self.write_varint(len(data))
-        self.write(data.encode('utf8'))
+        encoded = data.encode('utf8')
+        self.write(encode_varint(len(encoded)) + encoded)
+
+    def write_packet(self, packet: MinecraftPacket):
+        '''Write a packet with one write.'''
+        self.write(packet.build())
 
 
 class MinecraftProtocolBuffer(MinecraftProtocol):
+    '''
+    In-memory buffer of the protocol
+
+    Reads are zero-copy slices of a memoryview with a cursor, and writes go to
+    a preallocated buffer which grows by doubling and is reused after flush.
+    '''
+
+    __INITIAL_CAPACITY = 64
+
     def __init__(self, data: bytes = b''):
-        self.__read_buffer = bytearray(data)
-        self.__write_buffer = bytearray()
+        if not isinstance(data, (bytes, memoryview)):
+            data = bytes(data)
+        self.__read_buffer = memoryview(data)
+        self.__read_offset = 0
+        self.__write_buffer = bytearray(self.__INITIAL_CAPACITY)
+        self.__write_offset = 0
 
     async def connect(self):
         pass
 
-    async def read(self, length: int) -> bytes:
-        data = bytes(self.__read_buffer[:length])
-        self.__read_buffer = self.__read_buffer[length:]
+    async def read(self, length: int) -> memoryview:
+        '''Read bytes without copying them.'''
+        start = self.__read_offset
+        data = self.__read_buffer[start:start + length]
+        self.__read_offset = start + len(data)
         return data
 
     def write(self, data: bytes):
         '''Write bytes'''
-        self.__write_buffer.extend(data)
+        end = self.__write_offset + len(data)
+        if end > len(self.__write_buffer):
+            self.__grow(end)
+        self.__write_buffer[self.__write_offset:end] = data
+        self.__write_offset = end
 
     def flush(self) -> bytes:
         '''Return buffered data and its flush buffer.'''
-        data = bytes(self.__write_buffer)
-        self.__write_buffer = bytearray()
+        with memoryview(self.__write_buffer) as view:
+            data = bytes(view[:self.__write_offset])
+        self.__write_offset = 0
         return data
 
+    def __grow(self, size: int):
+        capacity = len(self.__write_buffer) * 2
+        while capacity < size:
+            capacity *= 2
+        self.__write_buffer.extend(bytes(capacity - len(self.__write_buffer)))
+
     def __len__(self) -> int:
-        return len(self.__write_buffer)
+        return self.__write_offset
 
 
 class MinecraftConnection(MinecraftProtocol):
@@ -123,80 +219,210 @@ class MinecraftConnection(MinecraftProtocol):
 
         self.timeout = timeout
         self.__connected = False
+        self.__exit_stack: Optional[AsyncExitStack] = None
+
+    async def __aenter__(self) -> 'MinecraftConnection':
+        '''
+        Connect to the server.
+
+        The connection is closed on exit, and everything from connecting to
+        exiting must finish within timeout seconds.
+        '''
+        async with AsyncExitStack() as stack:
+            stack.enter_context(fail_after(self.timeout))
+            stack.push_async_callback(self.close)
+            await self.connect()
+            self.__exit_stack = stack.pop_all()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        exit_stack, self.__exit_stack = self.__exit_stack, None
+        return await exit_stack.__aexit__(*exc_info)
 
     async def connect(self):
         '''Connect to the server and do the handshake'''
         if self.__connected:
             return
 
-        conn = asyncio.open_connection(self.__host, self.__port)
-        self.__reader, self.__writer = await asyncio.wait_for(conn, timeout=self.timeout)
-        await self.__handshake()
+        self.__reader, self.__writer = await asyncio.open_connection(
+            self.__host, self.__port)
         self.__connected = True
+        await self.__handshake()
+
+    async def close(self):
+        '''Close the connection.'''
+        if not self.__connected:
+            return
+
+        self.__connected = False
+        self.__writer.close()
+        try:
+            await self.__writer.wait_closed()
+        except OSError:
+            pass
 
     async def read(self, length: int) -> bytes:
-        data = bytearray()
-        while len(data) < length:
-            val = await asyncio.wait_for(
-                self.__reader.read(length - len(data)),
-                timeout=self.timeout
-            )
-            if len(val) == 0:
-                raise IOError('got no data from server')
-            data.extend(val)
-        return bytes(data)
+        try:
+            return await self.__reader.readexactly(length)
+        except asyncio.IncompleteReadError as error:
+            raise IOError('got no data from server') from error
 
     def write(self, data: bytes):
         '''Write data to the connected server.'''
         self.__writer.write(data)
 
     async def __handshake(self):
-        buffer = MinecraftProtocolBuffer()
-        buffer.write_varint(0)
-        buffer.write_varint(self.__VERSION)
-        buffer.write_string(self.__host)
-        buffer.write_ushort(self.__port)
-        buffer.write_varint(1)
-
-        data = buffer.flush()
-        self.write_varint(len(data))
-        self.write(data)
-
-    def __del__(self):
-        try:
-            self.__writer.close()
-        except:
-            pass
+        self.write_packet(
+            MinecraftPacket(0)
+            .varint(self.__VERSION)
+            .string(self.__host)
+            .ushort(self.__port)
+            .varint(1)
+        )
+
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def _skip_json_string(document: str, index: int) -> int:
+    '''Return the index after the end of the JSON string starting at index.'''
+    while True:
+        end = document.find('"', index + 1)
+        if end < 0:
+            raise json.JSONDecodeError('Unterminated string', document, index)
+
+        backslashes = 0
+        while document[end - backslashes - 1] == '\\':
+            backslashes += 1
+
+        if backslashes % 2 == 0:
+            return end + 1
+        index = end
+
+
+def decode_json_object(document: str, skip: Container[str] = ()) -> tuple[dict, dict[str, int]]:
+    '''
+    Decode a JSON object without decoding string values of the skip keys.
+
+    Return the decoded object and the offsets of the skipped strings in the
+    document. A skipped string is only scanned for its end, which is much
+    cheaper than decoding a large value such as a favicon.
+    '''
+    def whitespace(index: int) -> int:
+        return _JSON_WHITESPACE.match(document, index).end()
+
+    def expect(char: str, index: int) -> int:
+        if document[index:index + 1] != char:
+            raise json.JSONDecodeError(f'Expecting {char!r}', document, index)
+        return whitespace(index + 1)
+
+    result, skipped = {}, {}
+
+    index = expect('{', whitespace(0))
+    if document[index:index + 1] == '}':
+        index = whitespace(index + 1)
+    else:
+        while True:
+            if document[index:index + 1] != '"':
+                raise json.JSONDecodeError(
+                    'Expecting property name enclosed in double quotes', document, index)
+            key, index = scanstring(document, index + 1)
+            index = expect(':', whitespace(index))
+
+            if key in skip and document[index:index + 1] == '"':
+                skipped[key] = index
+                index = _skip_json_string(document, index)
+            else:
+                result[key], index = _JSON_DECODER.raw_decode(document, index)
+
+            index = whitespace(index)
+            if document[index:index + 1] == '}':
+                index = whitespace(index + 1)
+                break
+            index = expect(',', index)
+
+    if index != len(document):
+        raise json.JSONDecodeError('Extra data', document, index)
+
+    return result, skipped
 
 
 class MinecraftStatus:
-    '''Minecraft server status'''
+    '''
+    Minecraft server status
+
+    The favicon of a large status, which is often tens of KB, is only
+    decoded when favicon() is called. Small statuses are decoded at once
+    because json.loads is faster for them.
+
+    With ping, the ping/pong exchange follows the status on the same
+    connection and its round-trip time is returned by latency().
+    '''
 
     PACKET_ID_STATUS = 0x00
+    PACKET_ID_PING = 0x01
+
+    __LAZY_FIELDS = frozenset({'favicon'})
+    __LAZY_THRESHOLD = 16 * 1024
 
     __status: dict = None
 
-    def __init__(self, connection: MinecraftProtocol):
+    def __init__(self, connection: MinecraftProtocol, ping: bool = False):
         self.__connection = connection
+        self.__ping = ping
+        self.__latency: Optional[float] = None
+        self.__document = ''
+        self.__lazy_fields: dict[str, int] = {}
 
     async def read_status(self):
         if self.__status is not None:
             return
 
-        await self.__connection.connect()
+        async with self.__connection as connection:
+            connection.write_packet(MinecraftPacket(self.PACKET_ID_STATUS))
 
-        buffer = MinecraftProtocolBuffer()
-        buffer.write_varint(0)
-        self.__write_buffer(buffer)
+            length = await connection.read_varint()
+            raw_content = await connection.read(length)
+
+            if self.__ping:
+                self.__latency = await self.__read_pong(connection)
 
-        length = await self.__connection.read_varint()
-        raw_content = await self.__connection.read(length)
         result = MinecraftProtocolBuffer(raw_content)
 
         if await result.read_varint() != self.PACKET_ID_STATUS:
             raise IOError('invalid response')
 
-        self.__status = json.loads(await result.read_string())
+        document = await result.read_string()
+
+        if len(document) < self.__LAZY_THRESHOLD:
+            self.__status = json.loads(document)
+            return
+
+        self.__document = document
+        self.__status, self.__lazy_fields = decode_json_object(
+            document, self.__LAZY_FIELDS)
+
+    async def __read_pong(self, connection: MinecraftProtocol) -> float:
+        '''Send a ping and return seconds until the pong echoing it.'''
+        payload = time.time_ns() & 0x7FFFFFFFFFFFFFFF
+        started_at = time.perf_counter()
+        connection.write_packet(MinecraftPacket(self.PACKET_ID_PING).long(payload))
+
+        length = await connection.read_varint()
+        pong = MinecraftProtocolBuffer(await connection.read(length))
+        latency = time.perf_counter() - started_at
+
+        if await pong.read_varint() != self.PACKET_ID_PING:
+            raise IOError('invalid pong')
+        echoed = await pong.read(8)
+        if len(echoed) != 8 or struct.unpack('>q', echoed) != (payload,):
+            raise IOError('invalid pong')
+        return latency
+
+    def latency(self) -> Optional[float]:
+        '''Return the round-trip time of the ping in seconds if it was sent.'''
+        return self.__latency
 
     def description(self) -> str:
         return self.__status['description']['text']
@@ -212,7 +438,8 @@ class MinecraftStatus:
     def version(self) -> str:
         return self.__status['version']['name']
 
-    def __write_buffer(self, buffer: MinecraftProtocolBuffer):
-        data = buffer.flush()
-        self.__connection.write_varint(len(data))
-        self.__connection.write(data)
+    def favicon(self) -> Optional[str]:
+        '''Return the favicon as a data URI if the server has one.'''
+        if 'favicon' not in self.__lazy_fields:
+            return self.__status.get('favicon')
+        return scanstring(self.__document, self.__lazy_fields['favicon'] + 1)[0]
@@ -0,0 +1,211 @@
+'''Client of the Query protocol of Minecraft server'''
+
+import asyncio
+import random
+import struct
+import time
+from typing import Optional
+
+
+_MAGIC = b'\xfe\xfd'
+_TYPE_HANDSHAKE = 0x09
+_TYPE_STAT = 0x00
+
+# Constant paddings of the full stat response
+_STAT_PADDING = len(b'splitnum\x00\x80\x00')
+_PLAYERS_PADDING = len(b'\x01player_\x00\x00')
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    '''Datagram protocol queueing responses for the requests.'''
+
+    def __init__(self):
+        self.__transport: Optional[asyncio.DatagramTransport] = None
+        self.__responses: asyncio.Queue = asyncio.Queue()
+
+    def connection_made(self, transport):
+        self.__transport = transport
+
+    def datagram_received(self, data, addr):
+        self.__responses.put_nowait(data)
+
+    def error_received(self, exc):
+        # ICMP port unreachable is received as ConnectionRefusedError.
+        self.__responses.put_nowait(exc)
+
+    async def request(self, packet: bytes, type_: int, session_id: bytes, timeout: float) -> bytes:
+        '''Send the packet and return the payload of its response.'''
+        deadline = time.monotonic() + timeout
+        self.__transport.sendto(packet)
+
+        while True:
+            try:
+                response = await asyncio.wait_for(
+                    self.__responses.get(), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError as error:
+                raise TimeoutError('no response from query server') from error
+
+            if isinstance(response, Exception):
+                raise response
+
+            # Skip late responses to the previous requests.
+            if response[:1] == bytes((type_,)) and response[1:5] == session_id:
+                return response[5:]
+
+
+class MinecraftQuery:
+    '''
+    Minecraft server status over the Query protocol (GameSpy4 over UDP)
+
+    It has the same interface as MinecraftStatus, but players() returns all
+    the players instead of the sample of at most 12. The server needs
+    enable-query=true in server.properties.
+
+    See also https://wiki.vg/Query
+    '''
+
+    def __init__(
+        self,
+        address: str,
+        timeout: float = 3,
+        challenges: Optional['QueryChallenges'] = None,
+    ):
+        host, *port = address.split(':')
+        self.__host = host
+        self.__port = int(port[0]) if port else 25565
+        self.timeout = timeout
+        self.__challenges = challenges if challenges is not None else QueryChallenges()
+        self.__stats: Optional[dict[str, str]] = None
+        self.__players: list[str] = []
+        self.__latency: Optional[float] = None
+
+    async def read_status(self):
+        if self.__stats is not None:
+            return
+
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            _QueryProtocol, remote_addr=(self.__host, self.__port))
+
+        try:
+            # Each of handshake, stale stat and stat waits up to a third.
+            timeout = self.timeout / 3
+            session_id = struct.pack('>i', random.getrandbits(32) & 0x0F0F0F0F)
+            address = f'{self.__host}:{self.__port}'
+
+            token = self.__challenges.get(address)
+            if token is not None:
+                try:
+                    await self.__full_stat(protocol, session_id, token, timeout)
+                    return
+                except TimeoutError:
+                    # The server ignores stats with an expired token.
+                    self.__challenges.discard(address)
+
+            token = await self.__handshake(protocol, session_id, timeout)
+            self.__challenges.set(address, token)
+            await self.__full_stat(protocol, session_id, token, timeout)
+        finally:
+            transport.close()
+
+    async def __handshake(self, protocol: _QueryProtocol, session_id: bytes, timeout: float) -> bytes:
+        payload = await protocol.request(
+            _MAGIC + bytes((_TYPE_HANDSHAKE,)) + session_id,
+            _TYPE_HANDSHAKE, session_id, timeout)
+        token = int(payload.split(b'\x00', 1)[0])
+        return (token & 0xFFFFFFFF).to_bytes(4, 'big')
+
+    async def __full_stat(
+        self,
+        protocol: _QueryProtocol,
+        session_id: bytes,
+        token: bytes,
+        timeout: float,
+    ):
+        started_at = time.perf_counter()
+        payload = await protocol.request(
+            _MAGIC + bytes((_TYPE_STAT,)) + session_id + token + bytes(4),
+            _TYPE_STAT, session_id, timeout)
+        self.__latency = time.perf_counter() - started_at
+        self.__stats, self.__players = _decode_full_stat(payload)
+
+    def description(self) -> str:
+        return self.__stats['hostname']
+
+    def players(self) -> list[str]:
+        return self.__players
+
+    def version(self) -> str:
+        return self.__stats['version']
+
+    def favicon(self) -> Optional[str]:
+        '''The Query protocol doesn't have favicons.'''
+        return None
+
+    def latency(self) -> Optional[float]:
+        '''Return the round-trip time of the full stat in seconds.'''
+        return self.__latency
+
+
+def _decode_full_stat(payload: bytes) -> tuple[dict[str, str], list[str]]:
+    '''Decode the key values and the players of a full stat response.'''
+    index = _STAT_PADDING
+
+    def read_string() -> str:
+        nonlocal index
+        end = payload.index(b'\x00', index)
+        value = payload[index:end].decode('utf8', 'replace')
+        index = end + 1
+        return value
+
+    # The key values end with an empty key and the players with an empty name.
+    stats = {}
+    while (key := read_string()) != '':
+        stats[key] = read_string()
+
+    index += _PLAYERS_PADDING
+    players = []
+    while index < len(payload) and (name := read_string()) != '':
+        players.append(name)
+
+    return stats, players
+
+
+class QueryChallenges:
+    '''
+    Challenge tokens of Query servers cached between probes.
+
+    Vanilla servers regenerate tokens every 30 seconds, so a token is
+    reused for ttl seconds to skip the handshake.
+    '''
+
+    def __init__(self, ttl: float = 25):
+        self.__ttl = ttl
+        self.__tokens: dict[str, tuple[bytes, float]] = {}
+
+    def get(self, address: str) -> Optional[bytes]:
+        token = self.__tokens.get(address)
+        if token is None or token[1] <= time.monotonic():
+            return None
+        return token[0]
+
+    def set(self, address: str, token: bytes):
+        self.__tokens[address] = (token, time.monotonic() + self.__ttl)
+
+    def discard(self, address: str):
+        self.__tokens.pop(address, None)
+
+
+class MinecraftQueryClient:
+    '''Create MinecraftQuery sharing the challenge tokens.'''
+
+    def __init__(self, port: Optional[int] = None, timeout: float = 3, challenge_ttl: float = 25):
+        self.__port = port
+        self.__timeout = timeout
+        self.challenges = QueryChallenges(challenge_ttl)
+
+    def query(self, address: str) -> MinecraftQuery:
+        '''Return a query of the server. The port overrides the one of address.'''
+        if self.__port is not None:
+            address = f'{address.split(":")[0]}:{self.__port}'
+        return MinecraftQuery(address, timeout=self.__timeout, challenges=self.challenges)
@@ -0,0 +1,156 @@
+'''Tracker of long-running Compute Engine operations'''
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from logging import getLogger
+import time
+from typing import Callable, Optional
+
+from mclauncher.asyncutil import call
+from mclauncher.compute_engine import ComputeEngine
+from mclauncher.config import Config
+
+
+logger = getLogger('uvicorn')
+
+
+@dataclass
+class Operation:
+    '''State of a zone operation to start or stop an instance.'''
+    id: str
+    kind: str
+    status: str
+    progress: int = 0
+    error: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status == 'DONE' or self.error is not None
+
+
+class OperationTracker:
+    '''
+    Start and stop instances without waiting for the operations.
+
+    Operations are polled in background tasks with exponential backoff
+    until they are done or the deadline is exceeded. Requesting the same
+    kind of operation while one is in flight joins the in-flight one.
+    '''
+
+    __MAX_OPERATIONS = 100
+
+    def __init__(self, compute_engine: ComputeEngine, config: Config):
+        self.__compute_engine = compute_engine
+        self.__poll_interval = config.operation_poll_interval
+        self.__poll_max_interval = config.operation_poll_max_interval
+        self.__deadline = config.operation_deadline
+
+        self.__operations: OrderedDict[str, Operation] = OrderedDict()
+        self.__in_flight: dict[str, Operation] = {}
+        self.__tasks: set[asyncio.Task] = set()
+        self.__lock = asyncio.Lock()
+
+    async def start_instance(self) -> Operation:
+        '''Request to start the instance and return the operation.'''
+        return await self.__begin('start', self.__compute_engine.request_start_instance)
+
+    async def stop_instance(self) -> Operation:
+        '''Request to stop the instance and return the operation.'''
+        return await self.__begin('stop', self.__compute_engine.request_stop_instance)
+
+    async def get(self, operation_id: str) -> Optional[Operation]:
+        '''
+        Return the operation.
+
+        Operations started by other processes are looked up on Compute
+        Engine.
+        '''
+        operation = self.__operations.get(operation_id)
+        if operation is not None:
+            return operation
+
+        try:
+            result = await call(self.__compute_engine.get_operation, operation_id)
+        except Exception:
+            return None
+
+        return self.__update(
+            Operation(id=operation_id, kind=_kind(result), status='PENDING'),
+            result,
+        )
+
+    async def __begin(self, kind: str, request: Callable[[], dict]) -> Operation:
+        async with self.__lock:
+            in_flight = self.__in_flight.get(kind)
+            if in_flight is not None and not in_flight.done:
+                return in_flight
+
+            result = await call(request)
+            operation = self.__update(
+                Operation(id=result['name'], kind=kind, status='PENDING'),
+                result,
+            )
+            self.__remember(operation)
+
+            if not operation.done:
+                self.__in_flight[kind] = operation
+                task = asyncio.create_task(self.__poll(operation))
+                self.__tasks.add(task)
+                task.add_done_callback(self.__tasks.discard)
+
+            return operation
+
+    async def __poll(self, operation: Operation):
+        interval = self.__poll_interval
+        deadline = time.monotonic() + self.__deadline
+
+        try:
+            while not operation.done:
+                if time.monotonic() >= deadline:
+                    operation.error = 'deadline exceeded'
+                    break
+
+                await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+                interval = min(interval * 2, self.__poll_max_interval)
+
+                try:
+                    result = await call(self.__compute_engine.get_operation, operation.id)
+                except Exception as error:
+                    logger.error('get_operation(%s): %r', operation.id, error)
+                    continue
+
+                self.__update(operation, result)
+        finally:
+            if self.__in_flight.get(operation.kind) is operation:
+                del self.__in_flight[operation.kind]
+
+        if operation.error is not None:
+            logger.error('operation %s: %s', operation.id, operation.error)
+
+    def __remember(self, operation: Operation):
+        self.__operations[operation.id] = operation
+        while len(self.__operations) > self.__MAX_OPERATIONS:
+            self.__operations.popitem(last=False)
+
+    @staticmethod
+    def __update(operation: Operation, result: dict) -> Operation:
+        operation.status = result['status']
+        operation.progress = result.get('progress', operation.progress)
+        if 'error' in result:
+            operation.error = str(result['error'])
+        return operation
+
+
+# Operation types of Compute Engine by the kinds of tracked operations
+_KINDS = {
+    'start': 'start',
+    'resume': 'start',
+    'stop': 'stop',
+    'suspend': 'stop',
+}
+
+
+def _kind(result: dict) -> str:
+    '''Return the kind of an operation looked up on Compute Engine.'''
+    return _KINDS.get(result.get('operationType'), 'unknown')
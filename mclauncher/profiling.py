@@ -0,0 +1,124 @@
+'''Opt-in profiling of requests'''
+
+from collections import OrderedDict
+import cProfile
+from dataclasses import dataclass
+import io
+from logging import getLogger
+import os
+import pstats
+import random
+import time
+from typing import Awaitable, Callable, Optional
+import uuid
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from mclauncher.asyncutil import call
+from mclauncher.config import Config
+
+
+logger = getLogger('uvicorn')
+
+PROFILE_HEADER = 'X-Mclauncher-Profile'
+PROFILE_ID_HEADER = 'X-Mclauncher-Profile-Id'
+
+
+@dataclass(frozen=True)
+class RequestProfile:
+    '''cProfile of a request.'''
+    id: str
+    method: str
+    path: str
+    started_at: float
+    duration: float
+    profile: cProfile.Profile
+
+    def stats(self, limit: int = 50) -> str:
+        '''Return the functions taking the most cumulative time as text.'''
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream) \
+            .strip_dirs().sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+
+
+class RequestProfiler:
+    '''
+    Profile a sampled fraction of requests, and requests of authorized users
+    with the X-Mclauncher-Profile header.
+
+    cProfile records the event loop thread, so other requests handled
+    concurrently show up in a profile, and blocking backends running in the
+    thread pool show up as time waiting for them. Only one request is
+    profiled at a time. The last profiles are kept in memory, and dumped
+    to profiling_directory as .prof files if it's set.
+    '''
+
+    __MAX_PROFILES = 32
+
+    def __init__(
+        self,
+        config: Config,
+        is_authorized: Callable[[Request], Awaitable[bool]],
+    ):
+        self.__sample_rate = config.profiling_sample_rate
+        self.__directory = config.profiling_directory
+        self.__is_authorized = is_authorized
+        self.__profiling = False
+        self.__profiles: OrderedDict[str, RequestProfile] = OrderedDict()
+
+    @property
+    def profiles(self) -> list[RequestProfile]:
+        '''Profiles kept in memory from the oldest.'''
+        return list(self.__profiles.values())
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        return self.__profiles.get(profile_id)
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        '''Middleware profiling the request if it should be.'''
+        if self.__profiling or not await self.__should_profile(request):
+            return await call_next(request)
+
+        self.__profiling = True
+        profile = cProfile.Profile()
+        started_at, started = time.time(), time.perf_counter()
+        profile.enable()
+        try:
+            response = await call_next(request)
+        finally:
+            profile.disable()
+            self.__profiling = False
+
+        request_profile = RequestProfile(
+            id=uuid.uuid4().hex,
+            method=request.method,
+            path=request.url.path,
+            started_at=started_at,
+            duration=time.perf_counter() - started,
+            profile=profile,
+        )
+        await self.__store(request_profile)
+
+        response.headers[PROFILE_ID_HEADER] = request_profile.id
+        return response
+
+    async def __should_profile(self, request: Request) -> bool:
+        if PROFILE_HEADER in request.headers:
+            return await self.__is_authorized(request)
+        return random.random() < self.__sample_rate
+
+    async def __store(self, request_profile: RequestProfile):
+        self.__profiles[request_profile.id] = request_profile
+        while len(self.__profiles) > self.__MAX_PROFILES:
+            self.__profiles.popitem(last=False)
+
+        if self.__directory is None:
+            return
+
+        path = os.path.join(self.__directory, f'{request_profile.id}.prof')
+        try:
+            await call(request_profile.profile.dump_stats, path)
+        except OSError as error:
+            logger.error('dumping profile to %s: %r', path, error)
@@ -0,0 +1,115 @@
+'''Tracker of the Minecraft server becoming ready after a start'''
+
+import asyncio
+from contextlib import suppress
+from logging import getLogger
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+from mclauncher.config import Config
+
+
+logger = getLogger('uvicorn')
+
+PHASE_STARTING = 'starting'
+PHASE_READY = 'ready'
+
+
+class ReadinessTracker:
+    '''
+    Probe the server after a start until it answers on its status port.
+
+    The instance is DONE long before the Minecraft server has loaded the
+    world, so probes back off exponentially with jitter until the deadline,
+    and the time from the start to the first answer is recorded.
+    '''
+
+    def __init__(
+        self,
+        probe: Callable[[], Awaitable[bool]],
+        config: Config,
+        on_ready: Optional[Callable[[], None]] = None,
+    ):
+        self.__probe = probe
+        self.__on_ready = on_ready
+        self.__poll_interval = config.readiness_poll_interval
+        self.__poll_max_interval = config.readiness_poll_max_interval
+        self.__deadline = config.readiness_deadline
+
+        self.__phase: Optional[str] = None
+        self.__started_at = 0.0
+        self.__probed_at = 0.0
+        self.__time_to_ready: Optional[float] = None
+        self.__task: Optional[asyncio.Task] = None
+
+    @property
+    def phase(self) -> Optional[str]:
+        '''starting while probing after a start, ready once the server answered.'''
+        if self.__phase == PHASE_STARTING and (self.__task is None or self.__task.done()):
+            # The task was cancelled from outside, e.g. with its event loop.
+            return None
+        return self.__phase
+
+    @property
+    def probed_at(self) -> float:
+        '''Monotonic time of the last probe.'''
+        return self.__probed_at
+
+    @property
+    def time_to_ready(self) -> Optional[float]:
+        '''Seconds from the last start to the first answer of the server.'''
+        return self.__time_to_ready
+
+    def begin(self):
+        '''Start probing in the running event loop unless it's already probing.'''
+        if self.__task is not None and not self.__task.done():
+            return
+
+        self.__phase = PHASE_STARTING
+        self.__started_at = self.__probed_at = time.monotonic()
+        self.__time_to_ready = None
+        self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self):
+        '''Stop probing.'''
+        if self.__task is None:
+            return
+
+        self.__task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.__task
+        self.__task = None
+
+    async def __run(self):
+        interval = self.__poll_interval
+        deadline = self.__started_at + self.__deadline
+
+        while True:
+            try:
+                ready = await self.__probe()
+            except Exception:
+                ready = False
+            self.__probed_at = time.monotonic()
+
+            if ready:
+                self.__ready()
+                return
+
+            if self.__probed_at >= deadline:
+                logger.error('server not ready in %.0fs', self.__deadline)
+                self.__phase = None
+                return
+
+            # Equal jitter keeps workers from probing in lockstep.
+            delay = interval / 2 + random.uniform(0, interval / 2)
+            await asyncio.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            interval = min(interval * 2, self.__poll_max_interval)
+
+    def __ready(self):
+        self.__phase = PHASE_READY
+        self.__time_to_ready = self.__probed_at - self.__started_at
+        logger.info('server ready in %.1fs', self.__time_to_ready)
+
+        if self.__on_ready is not None:
+            self.__on_ready()
@@ -0,0 +1,172 @@
+'''Cached snapshot of the server status'''
+
+import asyncio
+from contextlib import suppress
+from dataclasses import dataclass, field
+from logging import getLogger
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union
+
+from mclauncher.cache import SingleFlightCache
+from mclauncher.circuit_breaker import CircuitOpenError
+from mclauncher.instance import Instance
+from mclauncher.latency import LatencyHistogram
+from mclauncher.minecraft import MinecraftProtocol, MinecraftStatus
+from mclauncher.minecraft_query import MinecraftQuery
+
+
+logger = getLogger('uvicorn')
+
+
+@dataclass(frozen=True)
+class ServerStatus:
+    '''Status of the instance and the Minecraft server at a point in time.'''
+    running: bool
+    players: list[str]
+    probed_at: float = field(default_factory=time.monotonic)
+    latency: Optional[float] = None
+
+    @property
+    def age(self) -> float:
+        '''Seconds since the status was probed.'''
+        return time.monotonic() - self.probed_at
+
+
+async def read_minecraft_status(
+    address: str,
+    connect_minecraft: Callable[[str], MinecraftProtocol],
+    query: Optional[Callable[[str], MinecraftQuery]] = None,
+    ping: bool = False,
+) -> Union[MinecraftStatus, MinecraftQuery]:
+    '''Read the status of the Minecraft server with query if it's given.'''
+    if query is not None:
+        mc_status = query(address)
+    else:
+        mc_status = MinecraftStatus(connect_minecraft(address), ping=ping)
+
+    await mc_status.read_status()
+    return mc_status
+
+
+async def probe_server(
+    get_instance: Callable[[], Awaitable[Instance]],
+    connect_minecraft: Callable[[str], MinecraftProtocol],
+    ping: bool = False,
+    query: Optional[Callable[[str], MinecraftQuery]] = None,
+) -> ServerStatus:
+    '''Probe the instance and the Minecraft server.'''
+    instance = await get_instance()
+
+    if not instance.is_running:
+        return ServerStatus(running=False, players=[])
+
+    try:
+        mc_status = await read_minecraft_status(
+            instance.address, connect_minecraft, query=query, ping=ping)
+    except (ConnectionRefusedError, CircuitOpenError):
+        return ServerStatus(running=False, players=[])
+
+    return ServerStatus(
+        running=True, players=mc_status.players(), latency=mc_status.latency())
+
+
+class ServerStatusCache(SingleFlightCache[ServerStatus]):
+    '''
+    Serve the server status from a short TTL cache.
+
+    Ping latencies of the probes are recorded to the latency histogram.
+    '''
+
+    def __init__(self, probe: Callable[[], Awaitable[ServerStatus]], ttl: float):
+        self.latency = LatencyHistogram()
+
+        async def probe_and_record() -> ServerStatus:
+            server_status = await probe()
+            if server_status.latency is not None:
+                self.latency.record(server_status.latency)
+            return server_status
+
+        super().__init__(load=probe_and_record, ttl=ttl)
+
+
+class ServerStatusPoller:
+    '''
+    Poll the server status in background and push changes to subscribers.
+
+    It only polls while someone is subscribed, so an idle launcher doesn't
+    call Compute Engine at all.
+    '''
+
+    def __init__(self, status_cache: ServerStatusCache, interval: float):
+        self.__cache = status_cache
+        self.__interval = interval
+        self.__latest: Optional[ServerStatus] = None
+        self.__subscribers: set[asyncio.Queue] = set()
+        self.__wakeup = asyncio.Event()
+        self.__task: Optional[asyncio.Task] = None
+
+    @property
+    def latest(self) -> Optional[ServerStatus]:
+        '''The last polled status.'''
+        return self.__latest
+
+    def start(self):
+        '''Start polling in the running event loop.'''
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self):
+        '''Stop polling.'''
+        if self.__task is None:
+            return
+
+        self.__task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.__task
+        self.__task = None
+
+    async def subscribe(self) -> AsyncIterator[ServerStatus]:
+        '''Yield the current status and then every change of it.'''
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.__subscribers.add(queue)
+        self.start()
+        self.__wakeup.set()
+
+        try:
+            latest = self.__latest
+            if latest is not None and latest.age <= self.__interval:
+                yield latest
+
+            while True:
+                yield await queue.get()
+        finally:
+            self.__subscribers.discard(queue)
+
+    async def __run(self):
+        while True:
+            if not self.__subscribers:
+                self.__wakeup.clear()
+                await self.__wakeup.wait()
+
+            try:
+                server_status = await self.__cache.get()
+            except Exception as error:
+                logger.error('polling server status: %r', error)
+            else:
+                self.__update(server_status)
+
+            await asyncio.sleep(self.__interval)
+
+    def __update(self, server_status: ServerStatus):
+        latest = self.__latest
+        self.__latest = server_status
+
+        if latest is not None \
+                and latest.running == server_status.running \
+                and latest.players == server_status.players:
+            return
+
+        for queue in self.__subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(server_status)
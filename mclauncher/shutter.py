@@ -1,15 +1,19 @@
-from typing import Callable
+from logging import getLogger
+from typing import Callable, Optional
 
-from google.auth.transport.requests import Request as AuthRequest
-from google.oauth2.id_token import verify_token
+from mclauncher.asyncutil import call
 from mclauncher.compute_engine import ComputeEngine
 from mclauncher.config import Config
-from mclauncher.firebase import Firebase
+from mclauncher.firebase import Firebase, FirestoreOperations
 
-from mclauncher.minecraft import MinecraftProtocol, MinecraftStatus
+from mclauncher.minecraft import MinecraftProtocol
+from mclauncher.minecraft_query import MinecraftQuery
+from mclauncher.operations import OperationTracker
+from mclauncher.server_status import read_minecraft_status
 
 
 _AUTH_SCHEME = "Bearer"
+logger = getLogger('uvicorn')
 
 
 class Shutter:
@@ -18,13 +22,17 @@ class Shutter:
         config: Config,
         connect_minecraft: Callable[[str], MinecraftProtocol],
         firebase: Firebase,
-        compute_engine: ComputeEngine
+        compute_engine: ComputeEngine,
+        operations: OperationTracker,
+        query: Optional[Callable[[str], MinecraftQuery]] = None,
     ):
         self.authorized_email = config.shutter_authorized_email
         self.count_to_shutdown = config.shutter_count_to_shutdown
         self.connect_minecraft = connect_minecraft
         self.firebase = firebase
         self.compute_engine = compute_engine
+        self.operations = operations
+        self.query = query
 
     def shutter_authorize(self, authorization: str) -> bool:
         id_token = authorization[len(_AUTH_SCHEME)+1:]
@@ -32,24 +40,41 @@ class Shutter:
         return result["email"] == self.authorized_email
 
     async def shutdown(self):
-        instance = self.compute_engine.get_instance()
+        firestore_operations = FirestoreOperations()
+        try:
+            await self._shutdown(firestore_operations)
+        finally:
+            logger.info(
+                'shutter: %d Firestore reads, %d writes',
+                firestore_operations.reads,
+                firestore_operations.writes,
+            )
+
+    async def _shutdown(self, firestore_operations: FirestoreOperations):
+        instance = await call(self.compute_engine.get_instance)
+
+        if instance.is_suspending:
+            # The instance is already going down.
+            return
 
         if not instance.is_running:
-            self.firebase.reset_consecutive_vacant()
+            await call(self.firebase.reset_consecutive_vacant, operations=firestore_operations)
             return
 
-        connection = self.connect_minecraft(instance.address)
-        mc_status = MinecraftStatus(connection)
-        await mc_status.read_status()
+        mc_status = await read_minecraft_status(
+            instance.address, self.connect_minecraft, query=self.query)
 
         if len(mc_status.players()) > 0:
-            self.firebase.reset_consecutive_vacant()
+            await call(self.firebase.reset_consecutive_vacant, operations=firestore_operations)
             return
 
-        count = self.firebase.count_consecutive_vacant()
+        count = await call(self.firebase.count_consecutive_vacant, operations=firestore_operations)
         if count >= self.count_to_shutdown:
-            self.compute_engine.stop_instance()
-            self.firebase.reset_consecutive_vacant()
+            await self.operations.stop_instance()
+            await call(self.firebase.reset_consecutive_vacant, operations=firestore_operations)
 
     def _verify_token(self, id_token: str):
+        from google.auth.transport.requests import Request as AuthRequest
+        from google.oauth2.id_token import verify_token
+
         return verify_token(id_token, AuthRequest())
@@ -1,13 +1,18 @@
 """Tests for main.py"""
 
-from typing import Any, ClassVar
+import asyncio
+from contextlib import suppress
+import json
+import time
+from typing import Any, ClassVar, Optional
 
 from fastapi.testclient import TestClient
+import pytest
 
 from mclauncher.app import create_app
 from mclauncher.compute_engine import ComputeEngine
 from mclauncher.config import Config
-from mclauncher.firebase import Firebase
+from mclauncher.firebase import Firebase, FirestoreOperations
 from mclauncher.instance import Instance
 from mclauncher.minecraft import MinecraftProtocolBuffer
 from mclauncher.shutter import Shutter
@@ -21,6 +26,7 @@ class MockConfig(Config):
     instance_zone: str = 'asia-northeast1-a'
     instance_name: str = 'minecraft'
     is_running: bool = True
+    instance_status: Optional[str] = None
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -34,38 +40,71 @@ class MockFirebase(Firebase):
         self.authorized_users = config.authorized_users
         MockFirebase.counter = 0
 
-    def count_consecutive_vacant(self) -> int:
+    def count_consecutive_vacant(self, operations: Optional[FirestoreOperations] = None) -> int:
         MockFirebase.counter += 1
         return MockFirebase.counter
 
-    def reset_consecutive_vacant(self) -> None:
+    def reset_consecutive_vacant(self, operations: Optional[FirestoreOperations] = None) -> None:
         MockFirebase.counter = 0
 
     def verify_id_token(self, id_token: str) -> Any:
         return {'email': id_token}
 
-    def _authorized_users(self) -> list[str]:
-        return self.authorized_users
+    def is_authorized_user(self, email: str) -> bool:
+        return email in self.authorized_users
 
 
 class MockComputeEngine(ComputeEngine):
     is_running: ClassVar[bool]
+    status: ClassVar[str]
+    last_action: ClassVar[Optional[str]]
 
     def __init__(self, config):
         self.config = config
         MockComputeEngine.is_running = config.is_running
+        MockComputeEngine.status = config.instance_status or (
+            'RUNNING' if config.is_running else 'TERMINATED')
+        MockComputeEngine.last_action = None
 
     def get_instance(self) -> Instance:
-        return Instance(is_running=self._is_running(), address="dummy")
+        return Instance(
+            is_running=self._is_running(),
+            address="dummy",
+            status=MockComputeEngine.status,
+        )
 
     def start_instance(self) -> bool:
-        MockComputeEngine.is_running = True
+        self.request_start_instance()
         return True
 
     def stop_instance(self) -> bool:
-        MockComputeEngine.is_running = False
+        self.request_stop_instance()
         return True
 
+    def request_start_instance(self) -> dict:
+        if MockComputeEngine.status == 'SUSPENDED':
+            MockComputeEngine.last_action = 'resume'
+        else:
+            MockComputeEngine.last_action = 'start'
+        MockComputeEngine.is_running = True
+        MockComputeEngine.status = 'RUNNING'
+        return {'name': 'operation-start', 'status': 'DONE', 'progress': 100}
+
+    def request_stop_instance(self) -> dict:
+        if self.config.instance_lifecycle == 'suspend':
+            MockComputeEngine.last_action = 'suspend'
+            MockComputeEngine.status = 'SUSPENDED'
+        else:
+            MockComputeEngine.last_action = 'stop'
+            MockComputeEngine.status = 'TERMINATED'
+        MockComputeEngine.is_running = False
+        return {'name': 'operation-stop', 'status': 'DONE', 'progress': 100}
+
+    def get_operation(self, name: str) -> dict:
+        if name != 'operation-start':
+            raise KeyError(name)
+        return {'name': name, 'status': 'DONE', 'progress': 100, 'operationType': 'start'}
+
     def _is_running(self) -> bool:
         return MockComputeEngine.is_running
 
@@ -97,8 +136,16 @@ def create_client(
     compute_engine_class=MockComputeEngine,
     shutter_class=MockShutter,
     is_running=True,
+    instance_lifecycle='stop',
+    instance_status=None,
+    metrics_token=None,
 ):
-    config = MockConfig(is_running=is_running)
+    config = MockConfig(
+        is_running=is_running,
+        instance_lifecycle=instance_lifecycle,
+        instance_status=instance_status,
+        metrics_token=metrics_token,
+    )
     app = create_app(
         config=config,
         connect_minecraft=connect_minecraft,
@@ -112,6 +159,18 @@ def create_client(
 client = create_client()
 
 
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+def server_json(response) -> dict:
+    """Return the body of GET /api/v1/server without the snapshot age."""
+    body = response.json()
+    assert body.pop('age') >= 0
+    return body
+
+
 def test_index():
     """Test for GET /"""
     response = client.get("/")
@@ -125,10 +184,271 @@ def test_get_api_v1_server_authorized():
         headers={'Authorization': 'Bearer authorized@example.com'}
     )
     assert response.status_code == 200
-    assert response.json() == {'running': True, 'players': [
+    assert server_json(response) == {'running': True, 'players': [
         'Player 1', 'Player 2']}
 
 
+def test_get_api_v1_server_cached():
+    connect = connect_minecraft(status)
+    probes = []
+
+    def counting_connect(address):
+        probes.append(address)
+        return connect(address)
+
+    config = MockConfig(server_status_ttl=60)
+    client = TestClient(create_app(
+        config=config,
+        connect_minecraft=counting_connect,
+        firebase_class=MockFirebase,
+        compute_engine_class=MockComputeEngine,
+        shutter_class=MockShutter,
+    ))
+
+    for _ in range(3):
+        response = client.get(
+            '/api/v1/server',
+            headers={'Authorization': 'Bearer authorized@example.com'}
+        )
+        assert response.status_code == 200
+        assert server_json(response) == {'running': True, 'players': [
+            'Player 1', 'Player 2']}
+
+    assert len(probes) == 1
+
+
+def test_get_api_v1_server_latency():
+    client = create_client()
+    client.get(
+        '/api/v1/server',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+
+    response = client.get(
+        '/api/v1/server/latency',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.status_code == 200
+    latency = response.json()
+    assert latency['count'] == 1
+    assert latency['buckets'][-1] == {'le': '+Inf', 'count': 1}
+    assert latency['last'] == latency['p50'] > 0
+
+    response = client.get(
+        '/api/v1/servers/minecraft/latency',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.json() == latency
+
+    response = client.get(
+        '/api/v1/servers/unknown/latency',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.status_code == 404
+
+
+def test_get_metrics():
+    client = create_client(metrics_token='secret')
+    client.get(
+        '/api/v1/server',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get(
+        '/metrics', headers={'Authorization': 'Bearer authorized@example.com'}
+    ).status_code == 403
+
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    lines = response.text.splitlines()
+    assert 'mclauncher_dependency_call_seconds_count{dependency="compute_engine",method="get_instance"} 1' in lines
+    assert 'mclauncher_dependency_call_seconds_count{dependency="firebase",method="verify_id_token"} 1' in lines
+    assert 'mclauncher_dependency_call_seconds_count{dependency="firebase",method="is_authorized_user"} 1' in lines
+    assert 'mclauncher_dependency_call_seconds_count{dependency="minecraft",method="status"} 1' in lines
+    assert 'mclauncher_cache_requests_total{cache="id_token",result="miss"} 1' in lines
+    assert 'mclauncher_cache_hit_ratio{cache="server_status",server="minecraft"} 0.0' in lines
+
+
+def test_get_metrics_disabled():
+    assert client.get('/metrics', headers={'Authorization': 'Bearer '}).status_code == 404
+
+
+def create_profiling_client(**config) -> TestClient:
+    return TestClient(create_app(
+        config=MockConfig(profiling=True, **config),
+        connect_minecraft=connect_minecraft(status),
+        firebase_class=MockFirebase,
+        compute_engine_class=MockComputeEngine,
+        shutter_class=MockShutter,
+    ))
+
+
+def test_profile_requested_by_authorized_user():
+    client = create_profiling_client()
+    headers = {'Authorization': 'Bearer authorized@example.com'}
+
+    response = client.get('/api/v1/server', headers=headers)
+    assert 'X-Mclauncher-Profile-Id' not in response.headers
+
+    response = client.get(
+        '/api/v1/server', headers={**headers, 'X-Mclauncher-Profile': '1'})
+    assert response.status_code == 200
+    profile_id = response.headers['X-Mclauncher-Profile-Id']
+
+    response = client.get('/api/v1/profiles', headers=headers)
+    profile, = response.json()['profiles']
+    assert profile['id'] == profile_id
+    assert profile['method'] == 'GET'
+    assert profile['path'] == '/api/v1/server'
+    assert profile['duration'] > 0
+
+    response = client.get(f'/api/v1/profiles/{profile_id}', headers=headers)
+    assert response.status_code == 200
+    assert 'function calls' in response.text
+
+    response = client.get('/api/v1/profiles/unknown', headers=headers)
+    assert response.status_code == 404
+
+
+def test_profile_requested_by_unauthorized_user():
+    client = create_profiling_client()
+    response = client.get('/', headers={
+        'Authorization': 'Bearer unauthorized@example.com',
+        'X-Mclauncher-Profile': '1',
+    })
+    assert response.status_code == 200
+    assert 'X-Mclauncher-Profile-Id' not in response.headers
+
+
+def test_profile_sampled(tmp_path):
+    client = create_profiling_client(
+        profiling_sample_rate=1.0, profiling_directory=str(tmp_path))
+
+    response = client.get('/')
+    profile_id = response.headers['X-Mclauncher-Profile-Id']
+    assert (tmp_path / f'{profile_id}.prof').exists()
+
+
+def test_profiling_disabled():
+    response = client.get(
+        '/api/v1/profiles',
+        headers={'Authorization': 'Bearer authorized@example.com', 'X-Mclauncher-Profile': '1'},
+    )
+    assert response.status_code == 404
+    assert 'X-Mclauncher-Profile-Id' not in response.headers
+
+
+def test_get_api_v1_server_stream_unauthorized():
+    response = client.get(
+        '/api/v1/server/stream',
+        headers={'Authorization': 'Bearer unauthorized'}
+    )
+    assert response.status_code == 403
+    assert response.json() == {'detail': 'forbidden'}
+
+
+@pytest.mark.anyio
+async def test_get_api_v1_server_stream():
+    config = MockConfig(server_status_ttl=0, server_status_poll_interval=0.01)
+    app = create_app(
+        config=config,
+        connect_minecraft=connect_minecraft(status),
+        firebase_class=MockFirebase,
+        compute_engine_class=MockComputeEngine,
+        shutter_class=MockShutter,
+    )
+
+    # TestClient buffers whole responses, so the endless stream is read
+    # from the ASGI app directly.
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': '/api/v1/server/stream',
+        'raw_path': b'/api/v1/server/stream',
+        'root_path': '',
+        'query_string': b'',
+        'headers': [
+            (b'host', b'testserver'),
+            (b'authorization', b'Bearer authorized@example.com'),
+        ],
+        'client': ('testclient', 50000),
+        'server': ('testserver', 80),
+    }
+    messages: asyncio.Queue = asyncio.Queue()
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def next_event() -> dict:
+        message = await asyncio.wait_for(messages.get(), timeout=5)
+        assert message['type'] == 'http.response.body'
+        assert message['more_body']
+        body = message['body'].decode()
+        assert body.startswith('data: ') and body.endswith('\n\n')
+        event = json.loads(body[len('data: '):])
+        assert event.pop('age') >= 0
+        return event
+
+    task = asyncio.create_task(app(scope, receive, messages.put))
+    try:
+        start = await asyncio.wait_for(messages.get(), timeout=5)
+        assert start['status'] == 200
+        headers = dict(start['headers'])
+        assert headers[b'content-type'].startswith(b'text/event-stream')
+        assert headers[b'cache-control'] == b'no-cache'
+
+        # None fields like phase are excluded.
+        assert await next_event() == {'running': True, 'players': ['Player 1', 'Player 2']}
+
+        MockComputeEngine.is_running = False
+        assert await next_event() == {'running': False, 'players': []}
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+def test_get_api_v1_servers():
+    config = MockConfig(fleet_json=json.dumps([
+        {'name': 'creative', 'instance_zone': 'asia-northeast1-b', 'instance_name': 'creative'},
+    ]))
+    client = TestClient(create_app(
+        config=config,
+        connect_minecraft=connect_minecraft(status),
+        firebase_class=MockFirebase,
+        compute_engine_class=MockComputeEngine,
+        shutter_class=MockShutter,
+    ))
+
+    response = client.get(
+        '/api/v1/servers',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.status_code == 200
+    servers = response.json()['servers']
+    assert [server['name'] for server in servers] == ['minecraft', 'creative']
+    assert all(server['running'] for server in servers)
+    assert all(server['error'] is None for server in servers)
+
+    response = client.get(
+        '/api/v1/servers/creative',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.status_code == 200
+    assert response.json()['players'] == ['Player 1', 'Player 2']
+
+    response = client.get(
+        '/api/v1/servers/unknown',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.status_code == 404
+
+
 def test_get_api_v1_server_unauthorized():
     response = client.get(
         '/api/v1/server',
@@ -145,7 +465,7 @@ def test_post_api_v1_server_instance_not_running():
         headers={'Authorization': 'Bearer authorized@example.com'}
     )
     assert response.status_code == 200
-    assert response.json() == {'running': False, 'players': []}
+    assert server_json(response) == {'running': False, 'players': []}
 
 
 def test_post_api_v1_server_server_timeout():
@@ -178,7 +498,7 @@ def test_post_api_v1_server_server_connection_refused():
         headers={'Authorization': 'Bearer authorized@example.com'}
     )
     assert response.status_code == 200
-    assert response.json() == {'running': False, 'players': []}
+    assert server_json(response) == {'running': False, 'players': []}
 
 
 def test_post_api_v1_server_start_authorized():
@@ -206,7 +526,152 @@ def test_post_api_v1_server_start_success():
         headers={'Authorization': 'Bearer authorized@example.com'}
     )
     assert response.status_code == 200
-    assert response.json() == {'ok': True}
+    assert response.json() == {'ok': True, 'operation_id': 'operation-start'}
+
+
+def test_get_api_v1_server_starting():
+    connections = []
+
+    class BootingConnection(MinecraftProtocolBuffer):
+        async def connect(self):
+            connections.append(self)
+            # The world never finishes loading, so the first probe is pending.
+            await asyncio.Event().wait()
+
+    with create_client(
+        connect_minecraft=connect_minecraft(status, protocol_class=BootingConnection),
+        is_running=False,
+    ) as client:
+        response = client.post(
+            '/api/v1/server/start',
+            headers={'Authorization': 'Bearer authorized@example.com'}
+        )
+        assert response.json() == {'ok': True, 'operation_id': 'operation-start'}
+
+        deadline = time.monotonic() + 5
+        while not connections and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(connections) == 1
+
+        response = client.get(
+            '/api/v1/server',
+            headers={'Authorization': 'Bearer authorized@example.com'}
+        )
+        assert response.status_code == 200
+        assert server_json(response) == {
+            'running': False, 'players': [], 'phase': 'starting'}
+        # The readiness tracker is probing, so the request didn't.
+        assert len(connections) == 1
+
+
+def test_get_api_v1_server_ready_with_open_circuit():
+    connections = []
+
+    class BootingConnection(MinecraftProtocolBuffer):
+        async def connect(self):
+            connections.append(self)
+            if len(connections) <= 3:
+                raise ConnectionRefusedError()
+
+    config = MockConfig(
+        is_running=False,
+        minecraft_breaker_failure_threshold=1,
+        minecraft_breaker_reset_timeout=60,
+        readiness_poll_interval=0.01,
+        readiness_poll_max_interval=0.02,
+    )
+    app = create_app(
+        config=config,
+        connect_minecraft=connect_minecraft(status, protocol_class=BootingConnection),
+        firebase_class=MockFirebase,
+        compute_engine_class=MockComputeEngine,
+        shutter_class=MockShutter,
+    )
+
+    with TestClient(app) as client:
+        response = client.post(
+            '/api/v1/server/start',
+            headers={'Authorization': 'Bearer authorized@example.com'}
+        )
+        assert response.json() == {'ok': True, 'operation_id': 'operation-start'}
+
+        # A refused probe of the fleet opens the circuit while the world loads.
+        response = client.get(
+            '/api/v1/servers/minecraft',
+            headers={'Authorization': 'Bearer authorized@example.com'}
+        )
+        assert response.json()['running'] is False
+
+        deadline = time.monotonic() + 5
+        while True:
+            response = client.get(
+                '/api/v1/server',
+                headers={'Authorization': 'Bearer authorized@example.com'}
+            )
+            body = server_json(response)
+            if body['phase'] != 'starting' or time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+
+        # The readiness probes bypassed the open circuit and closed it.
+        assert body.pop('time_to_ready') < 5
+        assert body == {
+            'running': True, 'players': ['Player 1', 'Player 2'], 'phase': 'ready'}
+
+
+@pytest.mark.parametrize('lifecycle', ['stop', 'suspend'])
+def test_post_api_v1_server_start_resume(lifecycle):
+    client = create_client(
+        is_running=False,
+        instance_lifecycle=lifecycle,
+        instance_status='SUSPENDED',
+    )
+    response = client.post(
+        '/api/v1/server/start',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.status_code == 200
+    assert response.json() == {'ok': True, 'operation_id': 'operation-start'}
+    assert MockComputeEngine.last_action == 'resume'
+    assert MockComputeEngine.status == 'RUNNING'
+
+
+def test_post_api_v1_server_start_suspending():
+    client = create_client(is_running=False, instance_status='SUSPENDING')
+    response = client.post(
+        '/api/v1/server/start',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.status_code == 409
+    assert MockComputeEngine.last_action is None
+
+
+def test_get_api_v1_operation():
+    client = create_client(is_running=False)
+    client.post(
+        '/api/v1/server/start',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    response = client.get(
+        '/api/v1/operations/operation-start',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        'id': 'operation-start',
+        'kind': 'start',
+        'status': 'DONE',
+        'progress': 100,
+        'error': None,
+    }
+
+
+def test_get_api_v1_operation_not_found():
+    response = client.get(
+        '/api/v1/operations/unknown',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.status_code == 404
 
 
 def test_post_shutter_unauthorized():
@@ -218,13 +683,18 @@ def test_post_shutter_unauthorized():
     assert response.json() == {'detail': 'forbidden'}
 
 
-def test_post_shutter_shutdown():
+@pytest.mark.parametrize('lifecycle,action,stopped_status', [
+    ('stop', 'stop', 'TERMINATED'),
+    ('suspend', 'suspend', 'SUSPENDED'),
+])
+def test_post_shutter_shutdown(lifecycle, action, stopped_status):
     client = create_client(
         connect_minecraft=connect_minecraft({
             'description': {'text': 'A Minecraft Server'},
             'players': {'sample': []},
             'version': {'name': '1.18'}
-        })
+        }),
+        instance_lifecycle=lifecycle,
     )
     response = client.post(
         '/shutter',
@@ -241,6 +711,22 @@ def test_post_shutter_shutdown():
     assert response.status_code == 200
     assert response.json() == {'ok': True}
     assert not MockComputeEngine.is_running
+    assert MockComputeEngine.last_action == action
+    assert MockComputeEngine.status == stopped_status
+
+
+def test_post_shutter_suspending():
+    client = create_client(is_running=False, instance_status='SUSPENDING')
+    MockFirebase.counter = 1
+
+    response = client.post(
+        '/shutter',
+        headers={'Authorization': 'Bearer shutter@example.com'}
+    )
+    assert response.status_code == 200
+    assert response.json() == {'ok': True}
+    assert MockComputeEngine.last_action is None
+    assert MockFirebase.counter == 1
 
 
 def test_post_shutter_reset():
@@ -268,3 +754,90 @@ def test_post_shutter_reset():
     assert response.json() == {'ok': True}
     assert MockComputeEngine.is_running
     assert MockFirebase.counter == 0
+
+
+class AsyncMockComputeEngine(MockComputeEngine):
+    async def get_instance(self) -> Instance:
+        return super().get_instance()
+
+    async def start_instance(self) -> bool:
+        return super().start_instance()
+
+    async def stop_instance(self) -> bool:
+        return super().stop_instance()
+
+    async def request_start_instance(self) -> dict:
+        return super().request_start_instance()
+
+    async def request_stop_instance(self) -> dict:
+        return super().request_stop_instance()
+
+    async def get_operation(self, name: str) -> dict:
+        return super().get_operation(name)
+
+
+def test_async_compute_engine():
+    client = create_client(
+        compute_engine_class=AsyncMockComputeEngine,
+        is_running=False,
+    )
+    response = client.post(
+        '/api/v1/server/start',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.status_code == 200
+    assert response.json() == {'ok': True, 'operation_id': 'operation-start'}
+
+    response = client.get(
+        '/api/v1/server',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.status_code == 200
+    body = server_json(response)
+    assert body.pop('phase') == 'ready'
+    assert body.pop('time_to_ready') >= 0
+    assert body == {'running': True, 'players': ['Player 1', 'Player 2']}
+
+
+class AsyncMockFirebase(MockFirebase):
+    async def is_authorized_user(self, email: str) -> bool:
+        return email in self.authorized_users
+
+    async def count_consecutive_vacant(self, operations: Optional[FirestoreOperations] = None) -> int:
+        return super().count_consecutive_vacant(operations)
+
+    async def reset_consecutive_vacant(self, operations: Optional[FirestoreOperations] = None) -> None:
+        super().reset_consecutive_vacant(operations)
+
+    async def verify_id_token(self, id_token: str) -> Any:
+        return super().verify_id_token(id_token)
+
+
+def test_async_firebase():
+    client = create_client(
+        connect_minecraft=connect_minecraft({
+            'description': {'text': 'A Minecraft Server'},
+            'players': {'sample': []},
+            'version': {'name': '1.18'}
+        }),
+        firebase_class=AsyncMockFirebase,
+    )
+
+    response = client.get(
+        '/api/v1/server',
+        headers={'Authorization': 'Bearer authorized@example.com'}
+    )
+    assert response.status_code == 200
+
+    response = client.get(
+        '/api/v1/server',
+        headers={'Authorization': 'Bearer unauthorized'}
+    )
+    assert response.status_code == 403
+
+    response = client.post(
+        '/shutter',
+        headers={'Authorization': 'Bearer shutter@example.com'}
+    )
+    assert response.status_code == 200
+    assert MockFirebase.counter == 1
@@ -0,0 +1,192 @@
+import asyncio
+
+import google.auth
+import httpx
+import pytest
+
+from mclauncher.async_compute_engine import AsyncComputeEngine
+from mclauncher.compute_engine import AGGREGATED_INSTANCES_FIELDS, INSTANCE_FIELDS
+from mclauncher.config import Config
+
+
+BASE_URL = 'https://compute.googleapis.com/compute/v1/projects/project'
+INSTANCE_URL = f'{BASE_URL}/zones/asia-northeast1-a/instances/minecraft'
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+class FakeCredentials:
+    def __init__(self):
+        self.token = None
+        self.refreshes = 0
+
+    @property
+    def valid(self) -> bool:
+        return self.token is not None
+
+    def refresh(self, _):
+        self.refreshes += 1
+        self.token = f'token-{self.refreshes}'
+
+
+def instance_resource(status: str, name: str = 'minecraft', zone: str = 'asia-northeast1-a') -> dict:
+    return {
+        'name': name,
+        'zone': f'{BASE_URL}/zones/{zone}',
+        'status': status,
+        'networkInterfaces': [{'accessConfigs': [{'natIP': '192.0.2.1'}]}],
+    }
+
+
+@pytest.fixture
+def credentials(monkeypatch) -> FakeCredentials:
+    credentials = FakeCredentials()
+    defaults = []
+
+    def default(scopes=None):
+        defaults.append(scopes)
+        assert len(defaults) == 1
+        return credentials, 'project'
+
+    monkeypatch.setattr(google.auth, 'default', default)
+    return credentials
+
+
+def create_compute_engine(handler, lifecycle: str = 'stop') -> tuple[AsyncComputeEngine, list[httpx.Request]]:
+    requests = []
+
+    def record(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return handler(request)
+
+    compute_engine = AsyncComputeEngine(Config(
+        shutter_authorized_email='shutter@example.com',
+        instance_zone='asia-northeast1-a',
+        instance_name='minecraft',
+        instance_lifecycle=lifecycle,
+    ))
+    compute_engine._AsyncComputeEngine__client = httpx.AsyncClient(
+        transport=httpx.MockTransport(record))
+    return compute_engine, requests
+
+
+@pytest.mark.anyio
+async def test_get_instance(credentials):
+    compute_engine, requests = create_compute_engine(
+        lambda _: httpx.Response(200, json=instance_resource('RUNNING')))
+
+    instances = await asyncio.gather(*(compute_engine.get_instance() for _ in range(3)))
+
+    assert all(instance.is_running for instance in instances)
+    assert instances[0].address == '192.0.2.1'
+    assert compute_engine.project == 'project'
+    assert credentials.refreshes == 1
+    assert [str(request.url.copy_with(query=None)) for request in requests] == [INSTANCE_URL] * 3
+    assert requests[0].url.params['fields'] == INSTANCE_FIELDS
+    assert requests[0].headers['Authorization'] == 'Bearer token-1'
+
+    # Expired credentials are refreshed before the next request.
+    credentials.token = None
+    await compute_engine.get_instance()
+    assert requests[-1].headers['Authorization'] == 'Bearer token-2'
+
+    await compute_engine.close()
+
+
+@pytest.mark.anyio
+async def test_list_instances(credentials):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if 'pageToken' not in request.url.params:
+            return httpx.Response(200, json={
+                'items': {'zones/asia-northeast1-a': {'instances': [instance_resource('RUNNING')]}},
+                'nextPageToken': 'page-2',
+            })
+        return httpx.Response(200, json={
+            'items': {
+                'zones/us-central1-a': {'instances': [
+                    instance_resource('TERMINATED', name='creative', zone='us-central1-a')]},
+                'zones/europe-west1-b': {},
+            },
+        })
+
+    compute_engine, requests = create_compute_engine(handler)
+
+    instances = await compute_engine.list_instances('minecraft')
+
+    assert set(instances) == {
+        ('asia-northeast1-a', 'minecraft'),
+        ('us-central1-a', 'creative'),
+    }
+    assert not instances[('us-central1-a', 'creative')].is_running
+    assert len(requests) == 2
+    assert requests[0].url.path == '/compute/v1/projects/project/aggregated/instances'
+    assert requests[0].url.params['filter'] == 'labels.minecraft:*'
+    assert requests[0].url.params['fields'] == AGGREGATED_INSTANCES_FIELDS
+    assert requests[1].url.params['pageToken'] == 'page-2'
+
+    await compute_engine.close()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('status,action', [
+    ('TERMINATED', 'start'),
+    ('SUSPENDED', 'resume'),
+])
+async def test_request_start_instance(credentials, status, action):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == 'GET':
+            return httpx.Response(200, json=instance_resource(status))
+        return httpx.Response(200, json={'name': f'operation-{action}', 'status': 'RUNNING'})
+
+    compute_engine, requests = create_compute_engine(handler)
+
+    assert (await compute_engine.request_start_instance())['name'] == f'operation-{action}'
+    assert requests[-1].method == 'POST'
+    assert str(requests[-1].url) == f'{INSTANCE_URL}/{action}'
+
+    await compute_engine.close()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('lifecycle', ['stop', 'suspend'])
+async def test_request_stop_instance(credentials, lifecycle):
+    compute_engine, requests = create_compute_engine(
+        lambda _: httpx.Response(200, json={'name': 'operation', 'status': 'RUNNING'}),
+        lifecycle=lifecycle,
+    )
+
+    await compute_engine.request_stop_instance()
+    assert str(requests[-1].url) == f'{INSTANCE_URL}/{lifecycle}'
+
+    await compute_engine.close()
+
+
+@pytest.mark.anyio
+async def test_get_operation_not_found(credentials):
+    compute_engine, requests = create_compute_engine(
+        lambda _: httpx.Response(404, json={'error': {'code': 404}}))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await compute_engine.get_operation('unknown')
+    assert requests[0].url.path == \
+        '/compute/v1/projects/project/zones/asia-northeast1-a/operations/unknown'
+
+    await compute_engine.close()
+
+
+@pytest.mark.anyio
+async def test_close(credentials):
+    compute_engine, _ = create_compute_engine(
+        lambda _: httpx.Response(200, json=instance_resource('RUNNING')))
+    client = compute_engine._AsyncComputeEngine__client
+
+    await compute_engine.close()
+    assert client.is_closed
+    await compute_engine.close()
+
+    # A new pooled client is created on the next request.
+    assert compute_engine._AsyncComputeEngine__get_client() is not client
+    await compute_engine.close()
@@ -0,0 +1,149 @@
+import threading
+
+import firebase_admin.auth
+import pytest
+
+from mclauncher.async_firebase import AsyncFirebase
+from mclauncher.config import Config
+
+from .test_firebase import FakeCollection, FakeDocument, FakeFirestore, FakeQuery
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+class AsyncFakeDocument:
+    def __init__(self, document: FakeDocument):
+        self.__document = document
+
+    async def get(self):
+        return self.__document.get()
+
+    async def set(self, data, merge=False):
+        return self.__document.set(data, merge=merge)
+
+
+class AsyncFakeQuery:
+    def __init__(self, query: FakeQuery):
+        self.__query = query
+
+    def limit(self, count):
+        return AsyncFakeQuery(self.__query.limit(count))
+
+    async def stream(self):
+        for snapshot in self.__query.stream():
+            yield snapshot
+
+
+class AsyncFakeCollection:
+    def __init__(self, collection: FakeCollection):
+        self.collection = collection
+
+    def document(self, document_id):
+        return AsyncFakeDocument(self.collection.document(document_id))
+
+    def where(self, filter):
+        return AsyncFakeQuery(self.collection.where(filter))
+
+
+class AsyncFakeFirestore:
+    '''Firestore AsyncClient backed by FakeFirestore.'''
+
+    def __init__(self):
+        self.firestore = FakeFirestore()
+
+    def collection(self, name):
+        return AsyncFakeCollection(self.firestore.collection(name))
+
+
+def create_firebase(monkeypatch, **config) -> AsyncFirebase:
+    firestore = AsyncFakeFirestore()
+    monkeypatch.setattr(AsyncFirebase, '_initialize_app', lambda _: None)
+    monkeypatch.setattr(AsyncFirebase, '_create_firestore', lambda *_: firestore)
+    return AsyncFirebase(Config(
+        firebase_credentials_json='{}',
+        shutter_authorized_email='shutter@example.com',
+        instance_zone='asia-northeast1-a',
+        instance_name='minecraft',
+        **config,
+    ))
+
+
+@pytest.mark.anyio
+async def test_count_consecutive_vacant(monkeypatch):
+    firebase = create_firebase(monkeypatch)
+
+    assert await firebase.count_consecutive_vacant() == 1
+    assert await firebase.count_consecutive_vacant() == 2
+    assert (firebase.firestore_reads, firebase.firestore_writes) == (0, 2)
+
+
+@pytest.mark.anyio
+async def test_reset_consecutive_vacant(monkeypatch):
+    firebase = create_firebase(monkeypatch)
+
+    await firebase.reset_consecutive_vacant()
+    assert firebase._firestore.firestore.document_ref.data == {'vacant_streak': 0}
+    assert (firebase.firestore_reads, firebase.firestore_writes) == (1, 1)
+
+    await firebase.reset_consecutive_vacant()
+    assert (firebase.firestore_reads, firebase.firestore_writes) == (2, 1)
+
+
+@pytest.mark.anyio
+async def test_is_authorized_user(monkeypatch):
+    firebase = create_firebase(monkeypatch)
+    collection = firebase._firestore.firestore.collection('authorized_users')
+    collection.document('user@example.com').set({'email': 'user@example.com'})
+
+    assert await firebase.is_authorized_user('User@Example.com')
+    assert firebase.firestore_reads == 1
+    assert collection.queries == 0
+
+    # Cached
+    assert await firebase.is_authorized_user('user@example.com')
+    assert firebase.firestore_reads == 1
+
+    assert not await firebase.is_authorized_user('other@example.com')
+    assert firebase.firestore_reads == 3
+    assert not await firebase.is_authorized_user('other@example.com')
+    assert firebase.firestore_reads == 3
+
+
+@pytest.mark.anyio
+async def test_is_authorized_user_with_legacy_document(monkeypatch):
+    firebase = create_firebase(monkeypatch)
+    collection = firebase._firestore.firestore.collection('authorized_users')
+    collection.document('random-id').set({'email': 'legacy@example.com'})
+
+    assert await firebase.is_authorized_user('legacy@example.com')
+    assert collection.queries == 1
+    assert firebase.firestore_reads == 2
+
+
+@pytest.mark.anyio
+async def test_is_authorized_user_with_mixed_case_legacy_document(monkeypatch):
+    firebase = create_firebase(monkeypatch)
+    collection = firebase._firestore.firestore.collection('authorized_users')
+    collection.document('random-id').set({'email': 'Legacy@Example.com'})
+
+    assert await firebase.is_authorized_user('Legacy@Example.com')
+
+
+@pytest.mark.anyio
+async def test_verify_id_token(monkeypatch):
+    threads = []
+
+    def verify_id_token(id_token):
+        threads.append(threading.get_ident())
+        return {'email': id_token}
+
+    monkeypatch.setattr(firebase_admin.auth, 'verify_id_token', verify_id_token)
+    firebase = create_firebase(monkeypatch)
+
+    assert await firebase.verify_id_token('user@example.com') == {'email': 'user@example.com'}
+    # Verified in the thread pool, not on the event loop.
+    assert len(threads) == 1
+    assert threads[0] != threading.get_ident()
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from mclauncher.circuit_breaker import CircuitBreaker, CircuitOpenError, MinecraftProbeGuard
+from mclauncher.config import Config
+from mclauncher.instance import Instance
+from mclauncher.minecraft import MinecraftProtocolBuffer, MinecraftStatus
+from mclauncher.server_status import probe_server
+
+from .util import connect_minecraft
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+status = {
+    'description': {'text': 'A Minecraft Server'},
+    'players': {'sample': [{'name': 'Steve'}]},
+    'version': {'name': '1.18'},
+}
+
+
+def create_guard(concurrency: int = 2, threshold: int = 2, reset_timeout: float = 60) -> MinecraftProbeGuard:
+    return MinecraftProbeGuard(Config(
+        shutter_authorized_email='shutter@example.com',
+        instance_zone='asia-northeast1-a',
+        instance_name='minecraft',
+        minecraft_probe_concurrency=concurrency,
+        minecraft_breaker_failure_threshold=threshold,
+        minecraft_breaker_reset_timeout=reset_timeout,
+    ))
+
+
+class RefusedConnection(MinecraftProtocolBuffer):
+    connects = 0
+
+    async def connect(self):
+        RefusedConnection.connects += 1
+        raise ConnectionRefusedError()
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker('server', failure_threshold=2, reset_timeout=0)
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    # reset_timeout has passed, so a trial call is let through.
+    breaker.before_call()
+    assert breaker.state == 'half-open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_circuit_breaker_open():
+    breaker = CircuitBreaker('server', failure_threshold=1, reset_timeout=60)
+
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_cancelled()
+    assert breaker.state == 'open'
+
+
+@pytest.mark.anyio
+async def test_guard_fails_fast():
+    RefusedConnection.connects = 0
+    guard = create_guard(threshold=2)
+    connect = guard.guard(connect_minecraft(status, protocol_class=RefusedConnection))
+
+    for _ in range(2):
+        with pytest.raises(ConnectionRefusedError):
+            await MinecraftStatus(connect('server')).read_status()
+    assert guard.breaker('server').state == 'open'
+
+    with pytest.raises(CircuitOpenError):
+        await MinecraftStatus(connect('server')).read_status()
+    assert RefusedConnection.connects == 2
+
+    async def get_instance():
+        return Instance(address='server', is_running=True)
+
+    assert not (await probe_server(get_instance, connect)).running
+    assert RefusedConnection.connects == 2
+
+    guard.reset('server')
+    guard.reset('unknown')
+    assert guard.breaker('server').state == 'closed'
+    assert guard.breaker('unknown') is None
+
+
+@pytest.mark.anyio
+async def test_guard_limits_concurrency():
+    in_flight = 0
+    max_in_flight = 0
+
+    class SlowConnection(MinecraftProtocolBuffer):
+        async def connect(self):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+
+        async def close(self):
+            nonlocal in_flight
+            in_flight -= 1
+
+    guard = create_guard(concurrency=2)
+    connect = guard.guard(connect_minecraft(status, protocol_class=SlowConnection))
+
+    statuses = [MinecraftStatus(connect('server')) for _ in range(5)]
+    await asyncio.gather(*(mc_status.read_status() for mc_status in statuses))
+
+    assert max_in_flight == 2
+    assert all(mc_status.players() == ['Steve'] for mc_status in statuses)
+    assert guard.breaker('server').state == 'closed'
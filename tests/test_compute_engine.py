@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+
+from mclauncher.compute_engine import ComputeEngine, _to_instance
+from mclauncher.config import Config
+
+
+class FakeRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self, http=None):
+        self.result['http'] = http
+        return self.result
+
+
+class FakeInstances:
+    def __init__(self, status):
+        self.status = status
+        self.actions = []
+
+    def get(self, **_):
+        return FakeRequest({'name': 'minecraft', 'status': self.status})
+
+    def __getattr__(self, action):
+        def request(**_):
+            self.actions.append(action)
+            return FakeRequest({'name': f'operation-{action}', 'status': 'RUNNING'})
+        return request
+
+
+class FakeCompute:
+    def __init__(self, status):
+        self.instances_resource = FakeInstances(status)
+
+    def instances(self):
+        return self.instances_resource
+
+
+def create_compute_engine(status: str, lifecycle: str) -> tuple[ComputeEngine, FakeInstances]:
+    compute_engine = ComputeEngine(Config(
+        shutter_authorized_email='shutter@example.com',
+        instance_zone='asia-northeast1-a',
+        instance_name='minecraft',
+        instance_lifecycle=lifecycle,
+    ))
+    compute = FakeCompute(status)
+    compute_engine._ComputeEngine__client = compute
+    compute_engine._ComputeEngine__credentials = object()
+    compute_engine._ComputeEngine__project = 'project'
+    return compute_engine, compute.instances_resource
+
+
+@pytest.mark.parametrize('lifecycle,status,action', [
+    ('stop', 'TERMINATED', 'start'),
+    ('stop', 'SUSPENDED', 'resume'),
+    ('suspend', 'TERMINATED', 'start'),
+    ('suspend', 'SUSPENDED', 'resume'),
+])
+def test_request_start_instance(lifecycle, status, action):
+    compute_engine, instances = create_compute_engine(status, lifecycle)
+
+    assert compute_engine.request_start_instance()['name'] == f'operation-{action}'
+    assert instances.actions == [action]
+
+
+@pytest.mark.parametrize('lifecycle,action', [
+    ('stop', 'stop'),
+    ('suspend', 'suspend'),
+])
+def test_request_stop_instance(lifecycle, action):
+    compute_engine, instances = create_compute_engine('RUNNING', lifecycle)
+
+    assert compute_engine.request_stop_instance()['name'] == f'operation-{action}'
+    assert instances.actions == [action]
+
+
+def test_http_per_thread():
+    compute_engine, _ = create_compute_engine('TERMINATED', 'stop')
+    barrier = threading.Barrier(2)
+
+    def get_http(_):
+        barrier.wait(timeout=5)
+        first = compute_engine.request_stop_instance()['http']
+        second = compute_engine.request_stop_instance()['http']
+        assert first is second
+        return first
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        https = list(executor.map(get_http, range(2)))
+
+    assert https[0] is not None
+    assert https[0] is not https[1]
+
+
+@pytest.mark.parametrize('status,suspended,suspending', [
+    ('TERMINATED', False, False),
+    ('SUSPENDING', False, True),
+    ('SUSPENDED', True, False),
+])
+def test_to_instance_suspended(status, suspended, suspending):
+    instance = _to_instance({'name': 'minecraft', 'status': status})
+
+    assert not instance.is_running
+    assert instance.is_suspended == suspended
+    assert instance.is_suspending == suspending
@@ -0,0 +1,269 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.types import document, write
+
+from mclauncher.config import Config
+from mclauncher.firebase import AuthorizedUserLookups, Firebase, FirestoreOperations, normalize_email
+
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self.exists = data is not None
+        self.__data = data
+
+    def get(self, key):
+        return self.__data[key]
+
+
+class FakeDocument:
+    def __init__(self):
+        self.data = None
+
+    def get(self):
+        return FakeSnapshot(self.data)
+
+    def set(self, data, merge=False):
+        current = dict(self.data or {}) if merge else {}
+        results = []
+        for key, value in data.items():
+            if isinstance(value, transforms.Increment):
+                value = current.get(key, 0) + value.value
+                results.append(document.Value(integer_value=value))
+            current[key] = value
+        self.data = current
+        return write.WriteResult(transform_results=results)
+
+
+class FakeQuery:
+    def __init__(self, documents):
+        self.__documents = documents
+
+    def limit(self, count):
+        return FakeQuery(self.__documents[:count])
+
+    def stream(self):
+        return iter(self.__documents)
+
+
+class FakeWatch:
+    def __init__(self, callback):
+        self.callback = callback
+        self.is_active = True
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents: dict[str, FakeDocument] = {}
+        self.queries = 0
+        self.watch = None
+        self.watch_error = None
+
+    def document(self, document_id):
+        return self.documents.setdefault(document_id, FakeDocument())
+
+    def stream(self):
+        return [
+            FakeSnapshot(document.data)
+            for document in self.documents.values()
+            if document.data is not None
+        ]
+
+    def on_snapshot(self, callback):
+        if self.watch_error is not None:
+            raise self.watch_error
+        self.watch = FakeWatch(callback)
+        return self.watch
+
+    def where(self, filter):
+        self.queries += 1
+        return FakeQuery([
+            FakeSnapshot(document.data)
+            for document in self.documents.values()
+            if document.data is not None
+            and document.data.get(filter.field_path) in filter.value
+        ])
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.collections: dict[str, FakeCollection] = {}
+
+    def collection(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    @property
+    def document_ref(self):
+        return self.collection('shutter').document('shutter')
+
+
+def create_firebase(monkeypatch, watch: bool = False, **config) -> Firebase:
+    firestore = FakeFirestore()
+    monkeypatch.setattr(Firebase, '_initialize_app', lambda _: None)
+    monkeypatch.setattr(Firebase, '_create_firestore', lambda *_: firestore)
+    return Firebase(Config(
+        firebase_credentials_json='{}',
+        authorized_users_watch=watch,
+        shutter_authorized_email='shutter@example.com',
+        instance_zone='asia-northeast1-a',
+        instance_name='minecraft',
+        **config,
+    ))
+
+
+def test_count_consecutive_vacant(monkeypatch):
+    firebase = create_firebase(monkeypatch)
+
+    assert firebase.count_consecutive_vacant() == 1
+    assert firebase.count_consecutive_vacant() == 2
+    assert (firebase.firestore_reads, firebase.firestore_writes) == (0, 2)
+
+
+def test_reset_consecutive_vacant(monkeypatch):
+    firebase = create_firebase(monkeypatch)
+
+    firebase.reset_consecutive_vacant()
+    assert firebase._firestore.document_ref.data == {'vacant_streak': 0}
+    assert (firebase.firestore_reads, firebase.firestore_writes) == (1, 1)
+
+    firebase.reset_consecutive_vacant()
+    assert (firebase.firestore_reads, firebase.firestore_writes) == (2, 1)
+
+    firebase.count_consecutive_vacant()
+    firebase.reset_consecutive_vacant()
+    assert firebase._firestore.document_ref.data == {'vacant_streak': 0}
+    assert (firebase.firestore_reads, firebase.firestore_writes) == (3, 3)
+
+
+def test_count_operations_per_call(monkeypatch):
+    firebase = create_firebase(monkeypatch)
+    operations = FirestoreOperations()
+
+    firebase.count_consecutive_vacant(operations=operations)
+    # Lookups by other requests aren't counted to the call.
+    firebase.is_authorized_user('user@example.com')
+    firebase.reset_consecutive_vacant(operations=operations)
+
+    assert operations == FirestoreOperations(reads=1, writes=2)
+    assert (firebase.firestore_reads, firebase.firestore_writes) == (3, 2)
+
+
+def test_count_operations_concurrently(monkeypatch):
+    firebase = create_firebase(monkeypatch)
+
+    def count(_):
+        for _ in range(1000):
+            firebase._count_operations(reads=1, writes=1)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(count, range(8)))
+
+    assert (firebase.firestore_reads, firebase.firestore_writes) == (8000, 8000)
+
+
+def test_authorized_user_lookups_evicted_concurrently():
+    lookups = AuthorizedUserLookups(ttl=60)
+
+    def set_results(worker):
+        for i in range(2000):
+            lookups.set(f'user{worker}-{i}@example.com', True)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(set_results, range(8)))
+
+    # The oldest results were evicted without errors.
+    assert lookups.get('user0-0@example.com') is None
+    lookups.set('user@example.com', False)
+    assert lookups.get('user@example.com') is False
+
+
+def test_normalize_email():
+    assert normalize_email(' User@Example.COM ') == 'user@example.com'
+
+
+def test_is_authorized_user(monkeypatch):
+    firebase = create_firebase(monkeypatch)
+    collection = firebase._firestore.collection('authorized_users')
+    collection.document('user@example.com').set({'email': 'user@example.com'})
+
+    assert firebase.is_authorized_user('User@Example.com')
+    assert firebase.firestore_reads == 1
+
+    # Cached
+    assert firebase.is_authorized_user('user@example.com')
+    assert firebase.firestore_reads == 1
+
+    assert not firebase.is_authorized_user('other@example.com')
+    assert firebase.firestore_reads == 3
+    assert not firebase.is_authorized_user('other@example.com')
+    assert firebase.firestore_reads == 3
+
+
+def test_is_authorized_user_with_legacy_document(monkeypatch):
+    firebase = create_firebase(monkeypatch)
+    collection = firebase._firestore.collection('authorized_users')
+    collection.document('random-id').set({'email': 'legacy@example.com'})
+
+    assert firebase.is_authorized_user('legacy@example.com')
+    assert collection.queries == 1
+    assert firebase.firestore_reads == 2
+
+
+def test_is_authorized_user_with_mixed_case_legacy_document(monkeypatch):
+    firebase = create_firebase(monkeypatch)
+    collection = firebase._firestore.collection('authorized_users')
+    collection.document('random-id').set({'email': 'Legacy@Example.com'})
+
+    assert firebase.is_authorized_user('Legacy@Example.com')
+    assert not firebase.is_authorized_user('other@example.com')
+
+
+def test_is_authorized_user_cache_expires(monkeypatch):
+    firebase = create_firebase(monkeypatch, authorized_users_cache_ttl=0)
+    collection = firebase._firestore.collection('authorized_users')
+
+    assert not firebase.is_authorized_user('user@example.com')
+    collection.document('user@example.com').set({'email': 'user@example.com'})
+    assert firebase.is_authorized_user('user@example.com')
+
+
+def test_is_authorized_user_with_watch(monkeypatch):
+    firebase = create_firebase(monkeypatch, watch=True)
+    collection = firebase._firestore.collection('authorized_users')
+    collection.document('user@example.com').set({'email': 'user@example.com'})
+
+    assert firebase.is_authorized_user('User@Example.com')
+    assert not firebase.is_authorized_user('new@example.com')
+    assert firebase.firestore_reads == 1
+
+    # A snapshot replaces the allowlist without reading it again.
+    collection.watch.callback([FakeSnapshot({'email': 'New@Example.com'})], [], None)
+    assert firebase.is_authorized_user('new@example.com')
+    assert not firebase.is_authorized_user('user@example.com')
+    assert firebase.firestore_reads == 1
+
+
+def test_is_authorized_user_with_inactive_watch(monkeypatch):
+    firebase = create_firebase(monkeypatch, watch=True)
+    collection = firebase._firestore.collection('authorized_users')
+    collection.document('user@example.com').set({'email': 'user@example.com'})
+
+    assert firebase.is_authorized_user('user@example.com')
+    collection.watch.is_active = False
+    collection.watch.callback([], [], None)
+
+    # Falls back to the lookups of each email.
+    assert firebase.is_authorized_user('user@example.com')
+    assert firebase.firestore_reads == 2
+
+
+def test_is_authorized_user_with_failed_watch(monkeypatch):
+    firebase = create_firebase(monkeypatch, watch=True)
+    collection = firebase._firestore.collection('authorized_users')
+    collection.watch_error = RuntimeError('listen failed')
+    collection.document('user@example.com').set({'email': 'user@example.com'})
+
+    assert firebase.is_authorized_user('user@example.com')
+    assert not firebase.is_authorized_user('other@example.com')
+    assert firebase.firestore_reads == 3
+    assert collection.watch is None
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from mclauncher.config import Config
+from mclauncher.fleet import Fleet, FleetServer
+from mclauncher.instance import Instance
+from mclauncher.server_status import ServerStatus, ServerStatusCache, probe_server
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+def create_server(name: str, delay: float, in_flight: list[int]) -> FleetServer:
+    async def probe() -> ServerStatus:
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight[0], in_flight[1])
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            in_flight[0] -= 1
+        if delay < 0.01:
+            raise ConnectionResetError()
+        return ServerStatus(running=True, players=[name])
+
+    return FleetServer(
+        name=name,
+        compute_engine=None,
+        status_cache=ServerStatusCache(probe, ttl=0),
+    )
+
+
+@pytest.mark.anyio
+async def test_statuses_concurrently():
+    in_flight = [0, 0]
+    fleet = Fleet(
+        [create_server(f'server-{i}', 0.1, in_flight) for i in range(4)]
+        + [create_server('broken', 0, in_flight)],
+        concurrency=8,
+    )
+
+    started_at = time.monotonic()
+    results = await fleet.statuses()
+
+    assert time.monotonic() - started_at < 0.3
+    assert [server.name for server, _ in results][-1] == 'broken'
+    assert [result.players for _, result in results[:4]] == [
+        [f'server-{i}'] for i in range(4)]
+    assert isinstance(results[4][1], ConnectionResetError)
+
+
+@pytest.mark.anyio
+async def test_statuses_bounded():
+    in_flight = [0, 0]
+    fleet = Fleet(
+        [create_server(f'server-{i}', 0.02, in_flight) for i in range(6)],
+        concurrency=2,
+    )
+
+    await fleet.statuses()
+    assert in_flight[1] == 2
+
+
+class LabeledComputeEngine:
+    list_calls = 0
+    get_calls = 0
+
+    def __init__(self, config: Config):
+        self.instance_zone = config.instance_zone
+        self.instance_name = config.instance_name
+
+    async def get_instance(self) -> Instance:
+        LabeledComputeEngine.get_calls += 1
+        return Instance(address=None, is_running=False)
+
+    async def list_instances(self, label: str) -> dict[tuple[str, str], Instance]:
+        assert label == 'mclauncher'
+        LabeledComputeEngine.list_calls += 1
+        await asyncio.sleep(0.01)
+        return {
+            ('zone-a', f'instance-{i}'): Instance(address=None, is_running=False)
+            for i in range(4)
+        }
+
+
+@pytest.mark.anyio
+async def test_statuses_listed_by_label():
+    config = Config(
+        shutter_authorized_email='shutter@example.com',
+        instance_zone='zone-a',
+        instance_name='minecraft',
+        instance_label='mclauncher',
+        fleet_json=json.dumps([
+            {'name': f'server-{i}', 'instance_zone': 'zone-a', 'instance_name': f'instance-{i}'}
+            for i in range(5)
+        ]),
+    )
+    compute_engine = LabeledComputeEngine(config)
+    fleet = Fleet.from_config(
+        config=config,
+        compute_engine_class=LabeledComputeEngine,
+        connect_minecraft=None,
+        compute_engine=compute_engine,
+        status_cache=ServerStatusCache(
+            probe=lambda: probe_server(compute_engine.get_instance, None),
+            ttl=0,
+        ),
+    )
+
+    results = await fleet.statuses()
+
+    assert len(results) == 6
+    assert not any(result.running for _, result in results)
+    assert LabeledComputeEngine.list_calls == 1
+    # the configured instance and instance-4 which doesn't have the label
+    assert LabeledComputeEngine.get_calls == 2
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from mclauncher.id_token_cache import IdTokenCache
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+class CountingVerifier:
+    def __init__(self, exp_in: float = 3600):
+        self.calls = 0
+        self.exp_in = exp_in
+
+    def __call__(self, id_token: str):
+        self.calls += 1
+        return {'email': id_token, 'exp': time.time() + self.exp_in}
+
+
+@pytest.mark.anyio
+async def test_verify_id_token_cached():
+    verifier = CountingVerifier()
+    cache = IdTokenCache(verifier)
+
+    assert (await cache.verify_id_token('a'))['email'] == 'a'
+    assert (await cache.verify_id_token('a'))['email'] == 'a'
+    assert verifier.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.anyio
+async def test_verify_id_token_expired():
+    verifier = CountingVerifier(exp_in=-1)
+    cache = IdTokenCache(verifier)
+
+    await cache.verify_id_token('a')
+    await cache.verify_id_token('a')
+    assert verifier.calls == 2
+    assert len(cache) == 0
+
+
+@pytest.mark.anyio
+async def test_verify_id_token_ttl():
+    verifier = CountingVerifier()
+    cache = IdTokenCache(verifier, ttl=0)
+
+    await cache.verify_id_token('a')
+    await cache.verify_id_token('a')
+    assert verifier.calls == 2
+
+
+@pytest.mark.anyio
+async def test_verify_id_token_evicts_least_recently_used():
+    verifier = CountingVerifier()
+    cache = IdTokenCache(verifier, max_size=2)
+
+    await cache.verify_id_token('a')
+    await cache.verify_id_token('b')
+    await cache.verify_id_token('a')
+    await cache.verify_id_token('c')
+    assert len(cache) == 2
+
+    await cache.verify_id_token('a')
+    assert verifier.calls == 3
+    await cache.verify_id_token('b')
+    assert verifier.calls == 4
+
+
+@pytest.mark.anyio
+async def test_verify_id_token_disabled():
+    verifier = CountingVerifier()
+    cache = IdTokenCache(verifier, max_size=0)
+
+    await cache.verify_id_token('a')
+    await cache.verify_id_token('a')
+    assert verifier.calls == 2
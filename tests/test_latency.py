@@ -0,0 +1,30 @@
+from mclauncher.latency import LatencyHistogram
+
+
+def test_snapshot():
+    histogram = LatencyHistogram(window=4)
+    assert histogram.snapshot().count == 0
+    assert histogram.snapshot().p50 is None
+
+    for seconds in [0.001, 0.02, 0.02, 0.3]:
+        histogram.record(seconds)
+
+    snapshot = histogram.snapshot()
+    assert snapshot.count == 4
+    assert dict(snapshot.buckets)[0.005] == 1
+    assert dict(snapshot.buckets)[0.025] == 3
+    assert dict(snapshot.buckets)[float('inf')] == 4
+    assert snapshot.p50 == 0.02
+    assert snapshot.p99 == 0.3
+    assert snapshot.last == 0.3
+
+
+def test_window():
+    histogram = LatencyHistogram(window=2)
+    for seconds in [3.0, 0.001, 0.002]:
+        histogram.record(seconds)
+
+    snapshot = histogram.snapshot()
+    assert snapshot.count == 2
+    assert snapshot.p99 == 0.002
+    assert dict(snapshot.buckets)[2.5] == 2
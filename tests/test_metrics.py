@@ -0,0 +1,92 @@
+import inspect
+
+import pytest
+
+from mclauncher.metrics import Histogram, Metrics
+from mclauncher.minecraft import MinecraftStatus
+
+from .util import connect_minecraft
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+def test_histogram_cumulative_buckets():
+    histogram = Histogram(buckets=(0.1, 1.0, float('inf')))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(('a',), value)
+
+    counts, total = histogram.collect()[('a',)]
+    assert counts == [2, 3, 4]
+    assert total == pytest.approx(5.65)
+
+
+class Backend:
+    def get(self) -> str:
+        return 'value'
+
+    async def get_async(self) -> str:
+        return 'value'
+
+    def fail(self):
+        raise ValueError('failed')
+
+    def _private(self):
+        pass
+
+
+@pytest.mark.anyio
+async def test_instrument_class():
+    metrics = Metrics()
+    instrumented = metrics.instrument_class(Backend, 'backend')
+    backend = instrumented()
+
+    assert isinstance(backend, Backend)
+    assert inspect.iscoroutinefunction(backend.get_async)
+    assert backend.get() == 'value'
+    assert await backend.get_async() == 'value'
+    with pytest.raises(ValueError):
+        backend.fail()
+    backend._private()
+
+    calls = metrics.calls.collect()
+    assert set(calls) == {('backend', 'get'), ('backend', 'get_async'), ('backend', 'fail')}
+    assert metrics.errors.collect() == {('backend', 'fail', 'ValueError'): 1}
+
+
+@pytest.mark.anyio
+async def test_instrument_connection():
+    metrics = Metrics()
+    connect = metrics.instrument_connection(connect_minecraft({'description': 'A'}))
+
+    await MinecraftStatus(connect('localhost')).read_status()
+
+    counts, _ = metrics.calls.collect()[('minecraft', 'status')]
+    assert counts[-1] == 1
+
+
+def test_render():
+    class Cache:
+        hits = 3
+        misses = 1
+
+    metrics = Metrics()
+    metrics.observe('compute_engine', 'get_instance', 0.2)
+    metrics.observe('compute_engine', 'get_instance', 0.3, error=TimeoutError())
+    metrics.register_cache('id_token', Cache())
+    metrics.register(
+        'mclauncher_test', 'gauge', 'Test.', lambda: [({'name': 'a"b'}, 1)])
+
+    lines = metrics.render().splitlines()
+    labels = 'dependency="compute_engine",method="get_instance"'
+    assert '# TYPE mclauncher_dependency_call_seconds histogram' in lines
+    assert f'mclauncher_dependency_call_seconds_bucket{{{labels},le="0.1"}} 0' in lines
+    assert f'mclauncher_dependency_call_seconds_bucket{{{labels},le="0.25"}} 1' in lines
+    assert f'mclauncher_dependency_call_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    assert f'mclauncher_dependency_call_seconds_count{{{labels}}} 2' in lines
+    assert f'mclauncher_dependency_errors_total{{{labels},error="TimeoutError"}} 1' in lines
+    assert 'mclauncher_cache_requests_total{cache="id_token",result="hit"} 3' in lines
+    assert 'mclauncher_cache_hit_ratio{cache="id_token"} 0.75' in lines
+    assert 'mclauncher_test{name="a\\"b"} 1' in lines
@@ -1,8 +1,14 @@
+import json
+import time
+
 import pytest
 
-from mclauncher.minecraft import MinecraftStatus
+from mclauncher.minecraft import (
+    MinecraftConnection, MinecraftPacket, MinecraftProtocolBuffer, MinecraftStatus,
+    decode_json_object, encode_varint,
+)
 
-from .util import connect_minecraft
+from .util import connect_minecraft, start_minecraft_server
 
 
 @pytest.mark.anyio
@@ -30,3 +36,172 @@ async def test_read_status():
     assert status.description() == 'A Minecraft Server'
     assert status.players() == ['Player 1', 'Player 2']
     assert status.version() == '1.18'
+
+
+@pytest.mark.anyio
+async def test_protocol_buffer():
+    buffer = MinecraftProtocolBuffer()
+    data = bytes(range(256)) * 4
+    buffer.write_varint(len(data))
+    buffer.write(data)
+    buffer.write_string('Steve')
+    assert len(buffer) == 2 + len(data) + 6
+
+    reader = MinecraftProtocolBuffer(buffer.flush())
+    assert len(buffer) == 0
+    assert await reader.read_varint() == len(data)
+    assert bytes(await reader.read(len(data))) == data
+    assert await reader.read_string() == 'Steve'
+    assert bytes(await reader.read(1)) == b''
+
+    buffer.write_byte(1)
+    assert buffer.flush() == b'\x01'
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('value, encoded', [
+    (0, b'\x00'),
+    (1, b'\x01'),
+    (127, b'\x7f'),
+    (128, b'\x80\x01'),
+    (255, b'\xff\x01'),
+    (25565, b'\xdd\xc7\x01'),
+    (2147483647, b'\xff\xff\xff\xff\x07'),
+    (-1, b'\xff\xff\xff\xff\x0f'),
+    (-2147483648, b'\x80\x80\x80\x80\x08'),
+])
+async def test_varint(value, encoded):
+    assert encode_varint(value) == encoded
+    assert await MinecraftProtocolBuffer(encoded).read_varint() == value
+
+
+@pytest.mark.anyio
+async def test_write_packet():
+    class RecordingBuffer(MinecraftProtocolBuffer):
+        writes = 0
+
+        def write(self, data: bytes):
+            self.writes += 1
+            super().write(data)
+
+    buffer = RecordingBuffer()
+    buffer.write_packet(
+        MinecraftPacket(0).varint(757).string('ä.example.com').ushort(25565).varint(1)
+    )
+    assert buffer.writes == 1
+
+    reader = MinecraftProtocolBuffer(buffer.flush())
+    length = await reader.read_varint()
+    assert len(bytes(await reader.read(length + 1))) == length
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('anyio_backend', ['asyncio'])
+async def test_minecraft_connection():
+    status = {
+        'description': {'text': 'A Minecraft Server'},
+        'players': {'sample': [{'name': 'Steve'}]},
+        'version': {'name': '1.18'},
+    }
+    server = await start_minecraft_server(status)
+    host, port = server.sockets[0].getsockname()[:2]
+
+    async with server:
+        mc_status = MinecraftStatus(MinecraftConnection(f'{host}:{port}'))
+        await mc_status.read_status()
+        pinged = MinecraftStatus(MinecraftConnection(f'{host}:{port}'), ping=True)
+        await pinged.read_status()
+
+    assert mc_status.players() == ['Steve']
+    assert mc_status.latency() is None
+    assert pinged.players() == ['Steve']
+    assert 0 < pinged.latency() < 1
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('pong', [
+    b'\x09\x01' + bytes(8),
+    # truncated
+    b'\x05\x01' + bytes(4),
+])
+async def test_read_status_invalid_pong(pong):
+    class WrongPongBuffer(MinecraftProtocolBuffer):
+        wrong_pong = MinecraftProtocolBuffer(pong)
+
+        async def read(self, length: int):
+            data = await super().read(length)
+            if len(data) == 0:
+                return await self.wrong_pong.read(length)
+            return data
+
+    status = {'description': {'text': ''}, 'players': {}, 'version': {'name': ''}}
+    mc_status = MinecraftStatus(
+        connect_minecraft(status, protocol_class=WrongPongBuffer)('server'), ping=True)
+
+    with pytest.raises(IOError, match='invalid pong'):
+        await mc_status.read_status()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('anyio_backend', ['asyncio'])
+async def test_minecraft_connection_deadline():
+    status = {'description': {'text': ''}, 'players': {}, 'version': {'name': ''}}
+    server = await start_minecraft_server(status, delay=1)
+    host, port = server.sockets[0].getsockname()[:2]
+
+    async with server:
+        mc_status = MinecraftStatus(MinecraftConnection(f'{host}:{port}', timeout=0.1))
+        started_at = time.monotonic()
+        with pytest.raises(TimeoutError):
+            await mc_status.read_status()
+
+    assert time.monotonic() - started_at < 0.5
+
+
+@pytest.mark.parametrize('document', [
+    '{}',
+    ' { } ',
+    '{"favicon": "data:image/png;base64,AAAA", "players": {"online": 1}}',
+    '{"players": {"sample": [{"name": "Steve"}]}, "favicon": "a\\\\"}',
+    '{"favicon": "a\\"b\\\\\\"c", "version": {"name": "1.18"}}\n',
+    '{"favicon": null, "description": "text"}',
+])
+def test_decode_json_object(document):
+    expected = json.loads(document)
+    decoded, skipped = decode_json_object(document, {'favicon'})
+
+    for key, index in skipped.items():
+        decoded[key] = json.decoder.scanstring(document, index + 1)[0]
+
+    assert decoded == expected
+
+
+@pytest.mark.parametrize('document', [
+    '',
+    '[]',
+    '{"favicon": "abc}',
+    '{"favicon": "abc"',
+    '{"a": 1,}',
+    '{"a": 1} x',
+])
+def test_decode_json_object_invalid(document):
+    with pytest.raises(json.JSONDecodeError):
+        decode_json_object(document, {'favicon'})
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('favicon_size', [1024, 64 * 1024])
+async def test_read_status_favicon(favicon_size):
+    favicon = 'data:image/png;base64,' + 'A' * favicon_size
+    mock = connect_minecraft({
+        'description': {'text': 'A Minecraft Server'},
+        'players': {'online': 0},
+        'version': {'name': '1.18'},
+        'favicon': favicon,
+    })("dummy")
+
+    status = MinecraftStatus(mock)
+    await status.read_status()
+
+    assert status.players() == []
+    assert status.favicon() == favicon
@@ -0,0 +1,119 @@
+import socket
+
+import pytest
+
+from mclauncher.instance import Instance
+from mclauncher.minecraft_query import MinecraftQuery, MinecraftQueryClient
+from mclauncher.server_status import probe_server
+
+from .util import connect_minecraft, start_query_server
+
+
+STATS = {
+    'hostname': 'A Minecraft Server',
+    'gametype': 'SMP',
+    'game_id': 'MINECRAFT',
+    'version': '1.20.4',
+    'plugins': '',
+    'map': 'world',
+    'numplayers': '2',
+    'maxplayers': '20',
+    'hostport': '25565',
+    'hostip': '127.0.0.1',
+}
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.mark.anyio
+async def test_read_status():
+    players = [f'player{i}' for i in range(20)]
+    server = await start_query_server(STATS, players)
+    try:
+        query = MinecraftQuery(server.address)
+        await query.read_status()
+    finally:
+        server.transport.close()
+
+    assert query.description() == 'A Minecraft Server'
+    assert query.version() == '1.20.4'
+    # Unlike the status sample, the full stat lists all the players.
+    assert query.players() == players
+    assert query.favicon() is None
+    assert query.latency() >= 0
+
+
+@pytest.mark.anyio
+async def test_client_caches_token():
+    server = await start_query_server(STATS, ['Steve'])
+    client = MinecraftQueryClient()
+    try:
+        for _ in range(3):
+            query = client.query(server.address)
+            await query.read_status()
+            assert query.players() == ['Steve']
+    finally:
+        server.transport.close()
+
+    assert server.handshakes == 1
+
+
+@pytest.mark.anyio
+async def test_client_handshakes_again_on_new_token():
+    server = await start_query_server(STATS, ['Steve'])
+    client = MinecraftQueryClient(timeout=0.3)
+    try:
+        await client.query(server.address).read_status()
+        server.token = -123456
+
+        query = client.query(server.address)
+        await query.read_status()
+    finally:
+        server.transport.close()
+
+    assert query.players() == ['Steve']
+    assert server.handshakes == 2
+
+
+@pytest.mark.anyio
+async def test_client_overrides_port():
+    server = await start_query_server(STATS, ['Steve'])
+    port = int(server.address.split(':')[1])
+    try:
+        query = MinecraftQueryClient(port=port).query('127.0.0.1')
+        await query.read_status()
+    finally:
+        server.transport.close()
+
+    assert query.players() == ['Steve']
+
+
+@pytest.mark.anyio
+async def test_read_status_no_server():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    query = MinecraftQuery(f'127.0.0.1:{port}', timeout=0.3)
+    with pytest.raises((ConnectionRefusedError, TimeoutError)):
+        await query.read_status()
+
+
+@pytest.mark.anyio
+async def test_probe_server_with_query():
+    server = await start_query_server(STATS, ['Steve', 'Alex'])
+
+    async def get_instance():
+        return Instance(address=server.address, is_running=True)
+
+    try:
+        status = await probe_server(
+            get_instance, connect_minecraft({}), query=MinecraftQueryClient().query)
+    finally:
+        server.transport.close()
+
+    assert status.running
+    assert status.players == ['Steve', 'Alex']
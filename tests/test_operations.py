@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from mclauncher.config import Config
+from mclauncher.operations import OperationTracker
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+class FakeComputeEngine:
+    def __init__(self, polls_to_done: int = 2):
+        self.requests = 0
+        self.polls = 0
+        self.polls_to_done = polls_to_done
+
+    async def request_start_instance(self) -> dict:
+        self.requests += 1
+        return {'name': f'operation-{self.requests}', 'status': 'PENDING'}
+
+    async def get_operation(self, name: str) -> dict:
+        if name.startswith('other-'):
+            return {'name': name, 'status': 'DONE', 'operationType': name[len('other-'):]}
+        self.polls += 1
+        if self.polls < self.polls_to_done:
+            return {'name': name, 'status': 'RUNNING', 'progress': 50}
+        return {'name': name, 'status': 'DONE', 'progress': 100}
+
+
+def create_tracker(compute_engine, deadline: float = 5) -> OperationTracker:
+    config = Config(
+        shutter_authorized_email='shutter@example.com',
+        instance_zone='asia-northeast1-a',
+        instance_name='minecraft',
+        operation_poll_interval=0.01,
+        operation_poll_max_interval=0.02,
+        operation_deadline=deadline,
+    )
+    return OperationTracker(compute_engine, config)
+
+
+@pytest.mark.anyio
+async def test_start_instance_joins_in_flight():
+    compute_engine = FakeComputeEngine()
+    tracker = create_tracker(compute_engine)
+
+    first = await tracker.start_instance()
+    second = await tracker.start_instance()
+    assert first is second
+    assert compute_engine.requests == 1
+
+    while not first.done:
+        await asyncio.sleep(0.01)
+
+    assert first.status == 'DONE'
+    assert first.progress == 100
+    assert (await tracker.get(first.id)) is first
+
+    third = await tracker.start_instance()
+    assert third.id != first.id
+
+
+@pytest.mark.anyio
+async def test_start_instance_deadline():
+    compute_engine = FakeComputeEngine(polls_to_done=1000)
+    tracker = create_tracker(compute_engine, deadline=0.05)
+
+    operation = await tracker.start_instance()
+    while not operation.done:
+        await asyncio.sleep(0.01)
+
+    assert operation.status == 'RUNNING'
+    assert operation.error == 'deadline exceeded'
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('operation_type,kind', [
+    ('start', 'start'),
+    ('resume', 'start'),
+    ('stop', 'stop'),
+    ('suspend', 'stop'),
+    ('setLabels', 'unknown'),
+])
+async def test_get_operation_of_other_process(operation_type, kind):
+    tracker = create_tracker(FakeComputeEngine())
+
+    operation = await tracker.get(f'other-{operation_type}')
+    assert operation.kind == kind
+    assert operation.status == 'DONE'
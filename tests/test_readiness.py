@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from mclauncher.config import Config
+from mclauncher.readiness import ReadinessTracker
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+class FakeProbe:
+    def __init__(self, probes_to_ready: int):
+        self.probes = 0
+        self.probes_to_ready = probes_to_ready
+
+    async def __call__(self) -> bool:
+        self.probes += 1
+        if self.probes == 1:
+            raise TimeoutError()
+        return self.probes >= self.probes_to_ready
+
+
+def create_tracker(probe, deadline: float = 5, on_ready=None) -> ReadinessTracker:
+    config = Config(
+        shutter_authorized_email='shutter@example.com',
+        instance_zone='asia-northeast1-a',
+        instance_name='minecraft',
+        readiness_poll_interval=0.01,
+        readiness_poll_max_interval=0.02,
+        readiness_deadline=deadline,
+    )
+    return ReadinessTracker(probe, config, on_ready=on_ready)
+
+
+async def wait_phase(tracker: ReadinessTracker, phase):
+    while tracker.phase != phase:
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.anyio
+async def test_ready():
+    probe = FakeProbe(probes_to_ready=3)
+    ready = []
+    tracker = create_tracker(probe, on_ready=lambda: ready.append(True))
+    assert tracker.phase is None
+
+    tracker.begin()
+    tracker.begin()
+    assert tracker.phase == 'starting'
+    assert tracker.time_to_ready is None
+
+    await wait_phase(tracker, 'ready')
+    assert probe.probes == 3
+    assert ready == [True]
+    assert tracker.time_to_ready > 0
+
+
+@pytest.mark.anyio
+async def test_deadline_exceeded():
+    probe = FakeProbe(probes_to_ready=1000)
+    tracker = create_tracker(probe, deadline=0.05)
+
+    tracker.begin()
+    await asyncio.wait_for(wait_phase(tracker, None), 1)
+    assert tracker.time_to_ready is None
+
+
+@pytest.mark.anyio
+async def test_stop():
+    tracker = create_tracker(FakeProbe(probes_to_ready=1000))
+
+    tracker.begin()
+    await tracker.stop()
+    assert tracker.phase is None
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from mclauncher.server_status import ServerStatus, ServerStatusCache, ServerStatusPoller
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.mark.anyio
+async def test_get_coalesces_concurrent_probes():
+    probes = 0
+
+    async def probe() -> ServerStatus:
+        nonlocal probes
+        probes += 1
+        await asyncio.sleep(0.01)
+        return ServerStatus(running=True, players=['Steve'])
+
+    cache = ServerStatusCache(probe, ttl=60)
+    results = await asyncio.gather(*(cache.get() for _ in range(10)))
+
+    assert probes == 1
+    assert all(result is results[0] for result in results)
+
+    await cache.get()
+    assert probes == 1
+
+    cache.invalidate()
+    await cache.get()
+    assert probes == 2
+
+
+@pytest.mark.anyio
+async def test_get_does_not_cache_errors():
+    probes = 0
+
+    async def probe() -> ServerStatus:
+        nonlocal probes
+        probes += 1
+        raise TimeoutError()
+
+    cache = ServerStatusCache(probe, ttl=60)
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            await cache.get()
+
+    assert probes == 2
+
+
+@pytest.mark.anyio
+async def test_poller_pushes_changes():
+    statuses = [
+        ServerStatus(running=False, players=[]),
+        ServerStatus(running=False, players=[]),
+        ServerStatus(running=True, players=['Steve']),
+    ]
+    probes = 0
+
+    async def probe() -> ServerStatus:
+        nonlocal probes
+        probes += 1
+        return statuses[min(probes, len(statuses)) - 1]
+
+    poller = ServerStatusPoller(ServerStatusCache(probe, ttl=0), interval=0.01)
+    poller.start()
+    await asyncio.sleep(0.05)
+    assert probes == 0
+
+    subscription = poller.subscribe()
+    first = await anext(subscription)
+    second = await anext(subscription)
+    await subscription.aclose()
+    await poller.stop()
+
+    assert (first.running, first.players) == (False, [])
+    assert (second.running, second.players) == (True, ['Steve'])
+    assert probes == 3
@@ -1,13 +1,29 @@
+import asyncio
 import json
 from typing import Callable
 
-from mclauncher.minecraft import MinecraftProtocolBuffer, MinecraftProtocol
+from mclauncher.minecraft import MinecraftPacket, MinecraftProtocolBuffer, MinecraftProtocol
 
 
 def connect_minecraft(
     status: dict,
     protocol_class: type[MinecraftProtocolBuffer] = MinecraftProtocolBuffer,
 ) -> Callable[[str], MinecraftProtocol]:
+    class PongingProtocol(protocol_class):
+        '''Respond a pong echoing the ping after the status.'''
+        pong = None
+
+        def write(self, data: bytes):
+            super().write(data)
+            if bytes(data[:2]) == b'\x09\x01':
+                self.pong = MinecraftProtocolBuffer(bytes(data))
+
+        async def read(self, length: int):
+            data = await super().read(length)
+            if len(data) == 0 and self.pong is not None:
+                return await self.pong.read(length)
+            return data
+
     def _minecraft_connector(_: str) -> MinecraftProtocol:
         content_buffer = MinecraftProtocolBuffer()
         content_buffer.write_varint(0)
@@ -16,6 +32,77 @@ def connect_minecraft(
         response_buffer.write_varint(len(content_buffer))
         response_buffer.write(content_buffer.flush())
 
-        return protocol_class(response_buffer.flush())
+        return PongingProtocol(response_buffer.flush())
 
     return _minecraft_connector
+
+
+async def start_minecraft_server(status: dict, delay: float = 0):
+    '''Start a local Minecraft server responding status after delay.'''
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # handshake and status request
+            for _ in range(2):
+                length = await MinecraftProtocolBuffer(await reader.readexactly(1)).read_varint()
+                await reader.readexactly(length)
+
+            await asyncio.sleep(delay)
+            writer.write(MinecraftPacket(0).string(json.dumps(status)).build())
+            await writer.drain()
+
+            # Echo the ping if the client sends one.
+            ping = await reader.read(10)
+            if ping:
+                writer.write(ping)
+                await writer.drain()
+            await reader.read()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+
+class QueryServer(asyncio.DatagramProtocol):
+    '''Local Query server responding full stats to the current token.'''
+
+    def __init__(self, stats: dict, players: list[str], token: int = 9513307):
+        self.stats = stats
+        self.players = players
+        self.token = token
+        self.handshakes = 0
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    @property
+    def address(self) -> str:
+        host, port = self.transport.get_extra_info('sockname')[:2]
+        return f'{host}:{port}'
+
+    def datagram_received(self, data, addr):
+        type_, session_id = data[2], data[3:7]
+
+        if type_ == 0x09:
+            self.handshakes += 1
+            self.transport.sendto(b'\x09' + session_id + b'%d\x00' % self.token, addr)
+            return
+
+        # Requests with expired tokens are ignored like vanilla servers.
+        if data[7:11] != self.token.to_bytes(4, 'big', signed=True):
+            return
+
+        payload = b'\x00' + session_id + b'splitnum\x00\x80\x00'
+        for key, value in self.stats.items():
+            payload += key.encode() + b'\x00' + value.encode() + b'\x00'
+        payload += b'\x00\x01player_\x00\x00'
+        for name in self.players:
+            payload += name.encode() + b'\x00'
+        self.transport.sendto(payload + b'\x00', addr)
+
+
+async def start_query_server(stats: dict, players: list[str]) -> QueryServer:
+    '''Start a local Query server. Close its transport after use.'''
+    _, server = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: QueryServer(stats, players), local_addr=('127.0.0.1', 0))
+    return server
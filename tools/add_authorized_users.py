@@ -4,7 +4,9 @@ from sys import argv
 
 from firebase_admin import credentials, initialize_app, firestore
 
-email = argv[1]
+from mclauncher.firebase import normalize_email
+
+email = normalize_email(argv[1])
 
 certificate_json = os.environ["FIREBASE_CREDENTIALS_JSON"]
 certificate = json.loads(certificate_json)
@@ -13,4 +15,7 @@ initialize_app(cred)
 
 firestore_database = firestore.client()
 
-firestore_database.collection('authorized_users').add({'email': email})
+# Documents are keyed by the normalized email so a user is looked up with a
+# single document get.
+firestore_database.collection('authorized_users') \
+    .document(email).set({'email': email})
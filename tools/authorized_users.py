@@ -0,0 +1,172 @@
+"""
+Import, export and diff authorized users in bulk.
+
+Emails are read from CSV (the `email` column, or the first column without a
+header) or JSONL (objects with `email` or plain strings) from a file or stdin.
+
+    poetry run python tools/authorized_users.py import users.csv
+    poetry run python tools/authorized_users.py export --format jsonl > users.jsonl
+    poetry run python tools/authorized_users.py diff users.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from firebase_admin import credentials, initialize_app, firestore
+
+from mclauncher.firebase import FIRESTORE_MAX_BATCH_WRITES, normalize_email
+
+COLLECTION = 'authorized_users'
+
+
+def detect_format(path, first_line):
+    if path is not None and path.endswith('.jsonl'):
+        return 'jsonl'
+    if path is not None and path.endswith('.csv'):
+        return 'csv'
+    return 'jsonl' if first_line.lstrip().startswith(('{', '"')) else 'csv'
+
+
+def read_emails(file, path, input_format):
+    '''Return normalized emails in the input in order without duplicates.'''
+    lines = file.read().splitlines()
+    if input_format == 'auto':
+        input_format = detect_format(path, lines[0] if lines else '')
+
+    if input_format == 'jsonl':
+        records = (json.loads(line) for line in lines if line.strip())
+        emails = (record['email'] if isinstance(record, dict) else record
+                  for record in records)
+    else:
+        rows = [row for row in csv.reader(lines) if row]
+        column = 0
+        if rows and 'email' in [normalize_email(cell) for cell in rows[0]]:
+            column = [normalize_email(cell) for cell in rows[0]].index('email')
+            rows = rows[1:]
+        emails = (row[column] for row in rows if len(row) > column)
+
+    normalized = (normalize_email(email) for email in emails)
+    return list(dict.fromkeys(email for email in normalized if email != ''))
+
+
+def load_existing(collection):
+    '''Return normalized emails in the collection.'''
+    return {
+        normalize_email((user.to_dict() or {}).get('email') or user.id)
+        for user in collection.stream()
+    }
+
+
+def report(action, count, started_at):
+    elapsed = time.perf_counter() - started_at
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f'{action} {count} emails in {elapsed:.2f}s ({rate:.1f}/s)', file=sys.stderr)
+
+
+def import_emails(firestore_database, emails, dry_run):
+    collection = firestore_database.collection(COLLECTION)
+    started_at = time.perf_counter()
+
+    existing = load_existing(collection)
+    new_emails = [email for email in emails if email not in existing]
+    print(f'{len(emails)} emails in input, {len(emails) - len(new_emails)} already authorized',
+          file=sys.stderr)
+
+    if dry_run:
+        for email in new_emails:
+            print(email)
+        return
+
+    batches = 0
+    for start in range(0, len(new_emails), FIRESTORE_MAX_BATCH_WRITES):
+        batch = firestore_database.batch()
+        for email in new_emails[start:start + FIRESTORE_MAX_BATCH_WRITES]:
+            batch.set(collection.document(email), {'email': email})
+        batch.commit()
+        batches += 1
+
+    report(f'imported ({batches} batches)', len(new_emails), started_at)
+
+
+def export_emails(firestore_database, output_format, file):
+    started_at = time.perf_counter()
+    emails = sorted(load_existing(firestore_database.collection(COLLECTION)))
+
+    if output_format == 'jsonl':
+        for email in emails:
+            file.write(json.dumps({'email': email}) + '\n')
+    else:
+        writer = csv.writer(file)
+        writer.writerow(['email'])
+        writer.writerows([email] for email in emails)
+
+    report('exported', len(emails), started_at)
+
+
+def diff_emails(firestore_database, emails):
+    '''Print + for emails only in the input and - for emails only in Firestore.'''
+    started_at = time.perf_counter()
+    existing = load_existing(firestore_database.collection(COLLECTION))
+    wanted = set(emails)
+
+    for email in sorted(wanted - existing):
+        print(f'+{email}')
+    for email in sorted(existing - wanted):
+        print(f'-{email}')
+
+    report('compared', len(wanted | existing), started_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='add emails which are not authorized yet')
+    import_parser.add_argument('--dry-run', action='store_true',
+                               help='print emails to add without writing them')
+
+    diff_parser = subparsers.add_parser('diff', help='compare emails with authorized users')
+
+    for subparser in (import_parser, diff_parser):
+        subparser.add_argument('input', nargs='?', help='input file (default: stdin)')
+        subparser.add_argument('--format', choices=['auto', 'csv', 'jsonl'], default='auto')
+
+    export_parser = subparsers.add_parser('export', help='print authorized users')
+    export_parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    export_parser.add_argument('--output', help='output file (default: stdout)')
+
+    args = parser.parse_args()
+
+    certificate_json = os.environ["FIREBASE_CREDENTIALS_JSON"]
+    certificate = json.loads(certificate_json)
+    cred = credentials.Certificate(certificate)
+    initialize_app(cred)
+
+    firestore_database = firestore.client()
+
+    if args.command == 'export':
+        if args.output is None:
+            export_emails(firestore_database, args.format, sys.stdout)
+        else:
+            with open(args.output, 'w', newline='') as file:
+                export_emails(firestore_database, args.format, file)
+        return
+
+    if args.input is None:
+        emails = read_emails(sys.stdin, None, args.format)
+    else:
+        with open(args.input, newline='') as file:
+            emails = read_emails(file, args.input, args.format)
+
+    if args.command == 'import':
+        import_emails(firestore_database, emails, args.dry_run)
+    else:
+        diff_emails(firestore_database, emails)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Rewrite authorized_users documents into documents keyed by normalized emails.
+
+Documents added with random IDs by older versions of add_authorized_users.py
+are copied to the document of their normalized email and then deleted.
+
+    poetry run python tools/migrate_authorized_users.py [--dry-run]
+"""
+
+import json
+import os
+from sys import argv
+
+from firebase_admin import credentials, initialize_app, firestore
+
+from mclauncher.firebase import FIRESTORE_MAX_BATCH_WRITES, normalize_email
+
+dry_run = '--dry-run' in argv[1:]
+
+certificate_json = os.environ["FIREBASE_CREDENTIALS_JSON"]
+certificate = json.loads(certificate_json)
+cred = credentials.Certificate(certificate)
+initialize_app(cred)
+
+firestore_database = firestore.client()
+collection = firestore_database.collection('authorized_users')
+
+batch = firestore_database.batch()
+writes = 0
+migrated = 0
+
+for user in collection.stream():
+    email = normalize_email(user.get('email') or '')
+    if email == '' or user.id == email:
+        continue
+
+    print(f'{user.id} -> {email}')
+    migrated += 1
+    if dry_run:
+        continue
+
+    batch.set(collection.document(email), {'email': email})
+    batch.delete(user.reference)
+    writes += 2
+
+    if writes >= FIRESTORE_MAX_BATCH_WRITES:
+        batch.commit()
+        batch = firestore_database.batch()
+        writes = 0
+
+if writes > 0:
+    batch.commit()
+
+print(f'{"found" if dry_run else "migrated"} {migrated} documents')